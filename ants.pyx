@@ -3,7 +3,20 @@ import sys
 import traceback
 import random
 import time
+import os
+import threading
+try:
+	from Queue import Queue
+except ImportError:
+	from queue import Queue
 from collections import defaultdict
+try:
+	import numpy
+except ImportError:
+	numpy = None
+from grid import Grid
+from vision import Vision
+from spatial import SpatialIndex
 
 cdef extern from "math.h":
 	double sqrt(double n)
@@ -20,6 +33,8 @@ HILL_ANT = string = 'ABCDEFGHI'
 PLAYER_HILL = string = '0123456789'
 MAP_OBJECT = '?%*.!'
 MAP_RENDER = PLAYER_ANT + HILL_ANT + PLAYER_HILL + MAP_OBJECT
+# first two characters of the per turn map records
+RECORDS = ('w ', 'f ', 'a ', 'd ', 'h ')
 
 AIM = {'n': (-1, 0),
 		'e': (0, 1),
@@ -39,7 +54,18 @@ BEHIND = {'n': 's',
 		'w': 'e'}
 
 class Ants():
-	def __init__(self):
+	def __init__(self, flat=False, buffered=True, collisions=False):
+		# flat keeps map, vision and the learned water layer in grid.Grid arrays
+		# indexed by row*cols + col instead of lists of lists
+		self.flat = flat
+		# buffered holds the orders until finish_turn writes them with go in one
+		# write, otherwise each order is written and flushed as it is issued
+		self.buffered = buffered
+		# collisions also rejects an order moving onto an already ordered destination
+		self.collisions = collisions
+		self.orders = {}
+		self.order_targets = {}
+		self.order_lines = []
 		self.cols = None
 		self.rows = None
 		self.map = None
@@ -50,7 +76,24 @@ class Ants():
 		self.turntime = 0
 		self.loadtime = 0
 		self.turn_start_time = None
+		# when the first settings line arrived, the loadtime runs from there
+		self.load_start_time = None
+		# seconds spent parsing the current turn's input, excluding waits on stdin
+		self.parse_time = 0.0
 		self.vision = None
+		# the numpy vision grid under self.vision, for whole-map work, None without numpy
+		self.vision_array = None
+		# kind -> SpatialIndex of this turn's ants, food or hills, built on first use
+		self.spatial_index = {}
+		self.spatial_fresh = set()
+		self.vision_grid = None
+		self.vision_pass = None
+		# the view disk as offsets that wrap by negative indexing, see build_vision_offsets
+		self.vision_offsets_2 = None
+		self.water = None
+		self.neighbor_index = None
+		self.adjacent = None
+		self.open_adjacent = None
 		self.viewradius2 = 0
 		self.attackradius2 = 0
 		self.spawnradius2 = 0
@@ -59,95 +102,208 @@ class Ants():
 	def setup(self, data):
 		'parse initial input and setup starting game state'
 		for line in data.split('\n'):
-			line = line.strip().lower()
-			if len(line) > 0:
-				tokens = line.split()
-				key = tokens[0]
-				if key == 'cols':
-					self.cols = int(tokens[1])
-				elif key == 'rows':
-					self.rows = int(tokens[1])
-				elif key == 'player_seed':
-					random.seed(int(tokens[1]))
-				elif key == 'turntime':
-					self.turntime = int(tokens[1])
-				elif key == 'loadtime':
-					self.loadtime = int(tokens[1])
-				elif key == 'viewradius2':
-					self.viewradius2 = int(tokens[1])
-				elif key == 'attackradius2':
-					self.attackradius2 = int(tokens[1])
-				elif key == 'spawnradius2':
-					self.spawnradius2 = int(tokens[1])
-				elif key == 'turns':
-					self.turns = int(tokens[1])
-		self.map = [[LAND for col in range(self.cols)]
-					for row in range(self.rows)]
+			self.setup_line(line)
+		self.finish_setup()
+
+	def setup_line(self, line):
+		'apply one settings line'
+		if self.load_start_time is None:
+			self.load_start_time = time.time()
+		tokens = line.strip().lower().split()
+		if len(tokens) < 2:
+			return
+		key = tokens[0]
+		if key == 'cols':
+			self.cols = int(tokens[1])
+		elif key == 'rows':
+			self.rows = int(tokens[1])
+		elif key == 'player_seed':
+			random.seed(int(tokens[1]))
+		elif key == 'turntime':
+			self.turntime = int(tokens[1])
+		elif key == 'loadtime':
+			self.loadtime = int(tokens[1])
+		elif key == 'viewradius2':
+			self.viewradius2 = int(tokens[1])
+		elif key == 'attackradius2':
+			self.attackradius2 = int(tokens[1])
+		elif key == 'spawnradius2':
+			self.spawnradius2 = int(tokens[1])
+		elif key == 'turns':
+			self.turns = int(tokens[1])
+
+	def finish_setup(self):
+		'allocate the map once all settings are known'
+		if self.flat:
+			self.map = Grid(self.rows, self.cols, LAND)
+			self.vision_grid = Grid(self.rows, self.cols, 0, 'B')
+			self.water = Grid(self.rows, self.cols, 0, 'B')
+		else:
+			self.map = [[LAND for col in range(self.cols)]
+						for row in range(self.rows)]
+		self.build_neighbors()
+
+	def build_neighbors(self):
+		'precalculate the wrapped n, e, s, w neighbors of every square'
+		cdef int row, col, rows, cols, i
+		rows = self.rows
+		cols = self.cols
+		locs = [(row, col) for row in range(rows) for col in range(cols)]
+		# flat indexes, row*cols + col
+		self.neighbor_index = []
+		for row in range(rows):
+			for col in range(cols):
+				self.neighbor_index.append((((row - 1) % rows) * cols + col,
+											row * cols + (col + 1) % cols,
+											((row + 1) % rows) * cols + col,
+											row * cols + (col - 1) % cols))
+		# the same table keyed by location, sharing the location tuples
+		self.adjacent = {}
+		self.open_adjacent = {}
+		for i, loc in enumerate(locs):
+			adjacent = tuple([locs[j] for j in self.neighbor_index[i]])
+			self.adjacent[loc] = adjacent
+			# water is removed from these lists as it is discovered
+			self.open_adjacent[loc] = list(adjacent)
+
+	def add_water(self, loc):
+		'remove a newly discovered water square from the passable neighbor lists'
+		for adj_loc in self.adjacent[loc]:
+			open_adjacent = self.open_adjacent[adj_loc]
+			if loc in open_adjacent:
+				open_adjacent.remove(loc)
 
 	def update(self, data):
 		'parse engine input and update the game state'
 		# start timer
-		cdef int row, col
 		self.turn_start_time = time.time()
+		self.begin_update()
+		for line in data.split('\n'):
+			self.parse_line(line)
 
+	def begin_update(self):
+		'clear the per turn state before the first record of a turn'
 		# reset vision
 		self.vision = None
+		self.vision_array = None
+		self.spatial_fresh = set()
+
+		# drop orders left over from a turn that raised before finish_turn
+		self.order_lines = []
+		self.orders = {}
+		self.order_targets = {}
 
 		# clear hill, ant and food data
 		self.hill_list = {}
-		for row, col in self.ant_list.keys():
-			self.map[row][col] = LAND
+		for loc in self.ant_list.keys():
+			self.set_cell(loc, LAND)
 		self.ant_list = {}
-		for row, col in self.dead_list.keys():
-			self.map[row][col] = LAND
+		for loc in self.dead_list.keys():
+			self.set_cell(loc, LAND)
 		self.dead_list = defaultdict(list)
-		for row, col in self.food_list:
-			self.map[row][col] = LAND
+		for loc in self.food_list:
+			self.set_cell(loc, LAND)
 		self.food_list = []
 
-		# update map and create new ant and food lists
-		for line in data.split('\n'):
-			line = line.strip().lower()
-			if len(line) > 0:
-				tokens = line.split()
-				if len(tokens) >= 3:
-					row = int(tokens[1])
-					col = int(tokens[2])
-					if tokens[0] == 'w':
-						self.map[row][col] = WATER
-					elif tokens[0] == 'f':
-						self.map[row][col] = FOOD
-						self.food_list.append((row, col))
-					else:
-						owner = int(tokens[3])
-						if tokens[0] == 'a':
-							self.map[row][col] = owner
-							self.ant_list[(row, col)] = owner
-						elif tokens[0] == 'd':
-							# food could spawn on a spot where an ant just died
-							# don't overwrite the space unless it is land
-							if self.map[row][col] == LAND:
-								self.map[row][col] = DEAD
-							# but always add to the dead list
-							self.dead_list[(row, col)].append(owner)
-						elif tokens[0] == 'h':
-							owner = int(tokens[3])
-							self.hill_list[(row, col)] = owner
+	def set_cell(self, loc, value):
+		cdef int row, col
+		row, col = loc
+		if self.flat:
+			self.map.data[row * self.cols + col] = value
+		else:
+			self.map[row][col] = value
+
+	def parse_line(self, line):
+		'apply one w, f, a, d or h record to the game state'
+		cdef int row, col, i
+		tokens = line.split()
+		if len(tokens) < 3:
+			return
+		key = tokens[0].lower()
+		row = int(tokens[1])
+		col = int(tokens[2])
+		if self.flat:
+			i = row * self.cols + col
+			cells = self.map.data
+			if key == 'w':
+				if not self.water.data[i]:
+					self.add_water((row, col))
+					self.water.data[i] = 1
+				cells[i] = WATER
+			elif key == 'f':
+				cells[i] = FOOD
+				self.food_list.append((row, col))
+			elif key == 'a':
+				owner = int(tokens[3])
+				cells[i] = owner
+				self.ant_list[(row, col)] = owner
+			elif key == 'd':
+				if cells[i] == LAND:
+					cells[i] = DEAD
+				self.dead_list[(row, col)].append(int(tokens[3]))
+			elif key == 'h':
+				self.hill_list[(row, col)] = int(tokens[3])
+			return
+		if key == 'w':
+			if self.map[row][col] != WATER:
+				self.add_water((row, col))
+			self.map[row][col] = WATER
+		elif key == 'f':
+			self.map[row][col] = FOOD
+			self.food_list.append((row, col))
+		else:
+			owner = int(tokens[3])
+			if key == 'a':
+				self.map[row][col] = owner
+				self.ant_list[(row, col)] = owner
+			elif key == 'd':
+				# food could spawn on a spot where an ant just died
+				# don't overwrite the space unless it is land
+				if self.map[row][col] == LAND:
+					self.map[row][col] = DEAD
+				# but always add to the dead list
+				self.dead_list[(row, col)].append(owner)
+			elif key == 'h':
+				self.hill_list[(row, col)] = owner
 
 	def time_remaining(self):
 		return self.turntime - int(1000 * (time.time() - self.turn_start_time))
 
+	def load_remaining(self):
+		'milliseconds of the loadtime left, counted from the first settings line'
+		if self.load_start_time is None:
+			return self.loadtime
+		return self.loadtime - int(1000 * (time.time() - self.load_start_time))
+
 	def issue_order(self, order):
 		'issue an order by writing the proper ant location and direction'
-		cdef int row, col 
+		cdef int row, col
 		(row, col), direction = order
-		sys.stdout.write('o %s %s %s\n' % (row, col, direction))
-		sys.stdout.flush()
+		# an ant gets one order per turn, later ones are rejected
+		if (row, col) in self.orders:
+			return False
+		if self.collisions:
+			dest = self.destination((row, col), direction)
+			if dest in self.order_targets:
+				return False
+			self.order_targets[dest] = (row, col)
+		self.orders[(row, col)] = direction
+		line = 'o %s %s %s\n' % (row, col, direction)
+		if self.buffered:
+			self.order_lines.append(line)
+		else:
+			sys.stdout.write(line)
+			sys.stdout.flush()
+		return True
 
 	def finish_turn(self):
-		'finish the turn by writing the go line'
-		sys.stdout.write('go\n')
+		'finish the turn by writing the buffered orders and the go line'
+		self.order_lines.append('go\n')
+		sys.stdout.write(''.join(self.order_lines))
 		sys.stdout.flush()
+		self.order_lines = []
+		self.orders = {}
+		self.order_targets = {}
 
 	def my_hills(self):
 		return [loc for loc, owner in self.hill_list.items()
@@ -174,16 +330,41 @@ class Ants():
 		'return a list of all food locations'
 		return self.food_list[:]
 
+	def spatial(self, kind):
+		'''a toroidal bucket index of this turn's 'mine', 'enemy', 'food' or 'hill'
+		locations (enemy hills for 'hill'), for radius and nearest queries'''
+		if kind not in self.spatial_fresh:
+			index = self.spatial_index.get(kind)
+			if index is None:
+				index = SpatialIndex(self.rows, self.cols, max(self.viewradius2, self.attackradius2))
+				self.spatial_index[kind] = index
+			if kind == 'mine':
+				index.build(self.my_ants())
+			elif kind == 'enemy':
+				index.build([loc for loc, owner in self.enemy_ants()])
+			elif kind == 'food':
+				index.build(self.food_list)
+			elif kind == 'hill':
+				index.build([loc for loc, owner in self.enemy_hills()])
+			else:
+				raise ValueError('unknown spatial kind: %s' % kind)
+			self.spatial_fresh.add(kind)
+		return self.spatial_index[kind]
+
 	def passable(self, loc):
 		'true if not water'
 		cdef int row, col
 		row, col = loc
+		if self.flat:
+			return self.map.data[row * self.cols + col] != WATER
 		return self.map[row][col] != WATER
 
 	def unoccupied(self, loc):
 		'true if no ants are at the location'
 		cdef int row, col
 		row, col = loc
+		if self.flat:
+			return self.map.data[row * self.cols + col] in (LAND, DEAD)
 		return self.map[row][col] in (LAND, DEAD)
 
 	def destination(self, loc, direction):
@@ -193,6 +374,14 @@ class Ants():
 		d_row, d_col = AIM[direction]
 		return ((row + d_row) % self.rows, (col + d_col) % self.cols)        
 
+	def neighbors(self, loc):
+		'the n, e, s, w neighbors of a location, wrapped'
+		return self.adjacent[loc]
+
+	def passable_neighbors(self, loc):
+		'the neighbors of a location not known to be water'
+		return self.open_adjacent[loc]
+
 	def distance(self, loc1, loc2):
 		'calculate the closest distance between to locations'
 		cdef int row1, col1, row2, col2, d_col, d_row
@@ -232,69 +421,316 @@ class Ants():
 				d.append('w')
 		return d
 
+	def build_vision_offsets(self):
+		'precalculate squares around an ant to set as visible'
+		cdef int mx, d, d_row, d_col
+		self.vision_offsets_2 = []
+		mx = int(sqrt(self.viewradius2))
+		for d_row in range(-mx, mx + 1):
+			for d_col in range(-mx, mx + 1):
+				d = d_row**2 + d_col**2
+				if d <= self.viewradius2:
+					self.vision_offsets_2.append((
+						# Create all negative offsets so vision will
+						# wrap around the edges properly
+						(d_row % self.rows) - self.rows,
+						(d_col % self.cols) - self.cols
+						))
+
+	def compute_vision(self):
+		' mark every square visible to my ants in self.vision '
+		if self.vision_pass is None:
+			self.vision_pass = Vision(self.rows, self.cols, self.viewradius2)
+		if self.vision_pass.vectorized:
+			# one numpy scatter of the view disk for all ants
+			self.set_vision(self.vision_pass.stamp(self.my_ants()))
+			return
+		cdef int mx, d, a_row, a_col, v_row, v_col, rows, cols
+		if self.vision_offsets_2 is None:
+			self.build_vision_offsets()
+		if self.flat:
+			# the flat backend reuses one buffer instead of allocating every turn
+			rows = self.rows
+			cols = self.cols
+			self.vision_grid.fill(0)
+			vision = self.vision_grid.data
+			for a_row, a_col in self.my_ants():
+				for v_row, v_col in self.vision_offsets_2:
+					vision[((a_row + v_row) % rows) * cols + (a_col + v_col) % cols] = 1
+			self.vision = self.vision_grid
+			return
+		# set all spaces as not visible
+		# loop through ants and set all squares around ant as visible
+		self.vision = [[False]*self.cols for row in range(self.rows)]
+		for ant in self.my_ants():
+			a_row, a_col = ant
+			for v_row, v_col in self.vision_offsets_2:
+				self.vision[a_row + v_row][a_col + v_col] = True
+
+	def set_vision(self, vision):
+		'''take a vision grid computed elsewhere, a (rows, cols) numpy array or
+		list of lists as Vision.stamp returns. visible() keeps to plain lists,
+		indexing numpy one square at a time is slower than the lists.'''
+		if numpy is not None and isinstance(vision, numpy.ndarray):
+			self.vision_array = vision
+			if self.flat:
+				self.vision_grid.numpy()[:] = vision
+				self.vision = self.vision_grid
+			else:
+				self.vision = vision.tolist()
+			return
+		self.vision_array = None
+		if self.flat:
+			data = self.vision_grid.data
+			cols = self.cols
+			for row, vision_row in enumerate(vision):
+				for col, is_visible in enumerate(vision_row):
+					data[row * cols + col] = 1 if is_visible else 0
+			self.vision = self.vision_grid
+		else:
+			self.vision = vision
+
 	def visible(self, loc):
 		' determine which squares are visible to the given player '
-		cdef int mx, d, a_row, a_col, row, col
-		if self.vision == None:
-			if not hasattr(self, 'vision_offsets_2'):
-				# precalculate squares around an ant to set as visible
-				self.vision_offsets_2 = []
-				mx = int(sqrt(self.viewradius2))
-				for d_row in range(-mx, mx + 1):
-					for d_col in range(-mx, mx + 1):
-						d = d_row**2 + d_col**2
-						if d <= self.viewradius2:
-							self.vision_offsets_2.append((
-								# Create all negative offsets so vision will
-								# wrap around the edges properly
-								(d_row % self.rows) - self.rows,
-								(d_col % self.cols) - self.cols
-								))
-							# set all spaces as not visible
-			# loop through ants and set all squares around ant as visible
-			self.vision = [[False]*self.cols for row in range(self.rows)]
-			for ant in self.my_ants():
-				a_row, a_col = ant
-				for v_row, v_col in self.vision_offsets_2:
-					self.vision[a_row + v_row][a_col + v_col] = True
+		cdef int row, col
+		if self.vision is None:
+			self.compute_vision()
 		row, col = loc
+		if self.flat:
+			return self.vision.data[row * self.cols + col] == 1
 		return self.vision[row][col]
 
+	def index(self, loc):
+		'flat grid index of a location'
+		cdef int row, col
+		row, col = loc
+		return row * self.cols + col
+
+	def location(self, index):
+		'location of a flat grid index'
+		return divmod(index, self.cols)
+
+	def passable_index(self, index):
+		'passable for a flat grid index, flat backend only'
+		return self.map.data[index] != WATER
+
+	def visible_index(self, index):
+		'visible for a flat grid index, flat backend only'
+		if self.vision is None:
+			self.compute_vision()
+		return self.vision.data[index] == 1
+
+	def visible_cells(self):
+		'flat indexes of every visible square, flat backend only'
+		if self.vision is None:
+			self.compute_vision()
+		return self.vision.cells(1)
+
+	def water_cells(self):
+		'flat indexes of every square ever seen as water, flat backend only'
+		return self.water.cells(1)
+
 	def render_text_map(self):
 		'return a pretty string representing the map'
 		tmp = ''
-		for row in self.map:
+		if self.flat:
+			map_rows = [self.map.row(row) for row in range(self.rows)]
+		else:
+			map_rows = self.map
+		for row in map_rows:
 			tmp += '# %s\n' % ''.join([MAP_RENDER[col] for col in row])
 		return tmp
 
 	# static methods are not tied to a class and don't have self passed in
 	# this is a python decorator
 	@staticmethod
-	def run(bot):
+	def run(bot, flat=False, buffered=True):
 		'parse input, update game state and call the bot classes do_turn method'
-		ants = Ants()
-		map_data = ''
+		ants = Ants(flat, buffered)
+		# read whatever is waiting on stdin in one call and dispatch the records as
+		# they arrive, bytes on python 3
+		stdin = getattr(sys.stdin, 'buffer', sys.stdin)
+		fd = stdin.fileno()
+		pending = ''
+		setup_done = False
+		in_turn = False
+		# the end record is followed by the final state, then go
+		ended = False
 		while(True):
 			try:
-				current_line = sys.stdin.readline().rstrip('\r\n') # string new line char
-				if current_line.lower() == 'ready':
-					ants.setup(map_data)
+				chunk = os.read(fd, 65536)
+			except KeyboardInterrupt:
+				raise
+			if not chunk:
+				break
+			if not isinstance(chunk, str):
+				chunk = chunk.decode('ascii')
+			lines = (pending + chunk).split('\n')
+			pending = lines.pop()
+			parse_start = time.time()
+			for line in lines:
+				try:
+					line = line.rstrip('\r')
+					key = line[:2].lower()
+					if key in RECORDS:
+						if not in_turn:
+							ants.begin_update()
+							in_turn = True
+						ants.parse_line(line)
+					elif key == 'go':
+						if not in_turn:
+							ants.begin_update()
+						in_turn = False
+						# start timer
+						ants.turn_start_time = time.time()
+						ants.parse_time += ants.turn_start_time - parse_start
+						if ended:
+							# bots may look at the final state, there are no orders to give
+							do_end = getattr(bot, 'do_end', None)
+							if do_end is not None:
+								do_end(ants)
+							return
+						# call the do_turn method of the class passed in
+						bot.do_turn(ants)
+						ants.finish_turn()
+						ants.parse_time = 0.0
+						parse_start = time.time()
+					elif key == 'en' and line.lower() == 'end':
+						ended = True
+					elif key == 're' and line.lower() == 'ready':
+						ants.finish_setup()
+						bot.do_setup(ants)
+						ants.finish_turn()
+						setup_done = True
+					elif not setup_done:
+						ants.setup_line(line)
+				except KeyboardInterrupt:
+					raise
+				except:
+					# don't raise error or return so that bot attempts to stay alive
+					traceback.print_exc(file=sys.stderr)
+					sys.stderr.flush()
+			ants.parse_time += time.time() - parse_start
+
+	@staticmethod
+	def run_threaded(bot, flat=False, buffered=True):
+		'''run like run() with the input read and parsed on a TurnReader thread.
+		The turn clock starts at the first line of a turn instead of at its go,
+		and between turns bot.do_idle(ants, time_remaining) is called if the bot
+		has one. The next turn is parsed into ants while that runs, so idle work
+		must keep to the bot's own state.'''
+		ants = Ants(flat, buffered)
+		reader = TurnReader(ants)
+		reader.start()
+		do_idle = getattr(bot, 'do_idle', None)
+		setup_done = False
+		while(True):
+			if setup_done and do_idle is not None and reader.events.empty():
+				try:
+					do_idle(ants, reader.idle_remaining)
+				except KeyboardInterrupt:
+					raise
+				except:
+					traceback.print_exc(file=sys.stderr)
+					sys.stderr.flush()
+			event = reader.events.get()
+			try:
+				if event[0] == 'eof':
+					break
+				elif event[0] == 'ready':
+					ants.finish_setup()
 					bot.do_setup(ants)
 					ants.finish_turn()
-					map_data = ''
-				elif current_line.lower() == 'go':
-					ants.update(map_data)
-					# call the do_turn method of the class passed in
+					setup_done = True
+				elif event[1]:
+					# the final state after end, there are no orders to give
+					do_end = getattr(bot, 'do_end', None)
+					if do_end is not None:
+						do_end(ants)
+					return
+				else:
 					bot.do_turn(ants)
 					ants.finish_turn()
-					map_data = ''
-				else:
-					map_data += current_line + '\n'
-			except EOFError:
-				break
 			except KeyboardInterrupt:
 				raise
 			except:
 				# don't raise error or return so that bot attempts to stay alive
 				traceback.print_exc(file=sys.stderr)
 				sys.stderr.flush()
+
+
+class TurnReader(threading.Thread):
+	'''reads the engine input on its own thread and parses the settings and
+	map records into ants as they arrive. What the game loop acts on is put
+	on events: ('ready',) once the settings are in, ('go', ended) once a turn
+	has been read, ended being True for the final state, and ('eof',).'''
+	def __init__(self, ants):
+		threading.Thread.__init__(self)
+		self.daemon = True
+		self.ants = ants
+		self.events = Queue()
+		# when the first line of the turn being read arrived, None between turns
+		self.turn_start = None
+
+	def idle_remaining(self):
+		'milliseconds idle work may go on, 0 once the next turn has been read'
+		if not self.events.empty():
+			return 0
+		turn_start = self.turn_start
+		if turn_start is None:
+			return self.ants.turntime
+		return self.ants.turntime - int(1000 * (time.time() - turn_start))
+
+	def run(self):
+		ants = self.ants
+		stdin = getattr(sys.stdin, 'buffer', sys.stdin)
+		fd = stdin.fileno()
+		pending = ''
+		setup_done = False
+		in_turn = False
+		ended = False
+		while(True):
+			chunk = os.read(fd, 65536)
+			if not chunk:
+				break
+			arrived = time.time()
+			if not isinstance(chunk, str):
+				chunk = chunk.decode('ascii')
+			lines = (pending + chunk).split('\n')
+			pending = lines.pop()
+			parse_start = arrived
+			for line in lines:
+				try:
+					line = line.rstrip('\r')
+					if setup_done and self.turn_start is None:
+						# the engine's clock runs from when it sent the turn
+						self.turn_start = arrived
+						ants.parse_time = 0.0
+					key = line[:2].lower()
+					if key in RECORDS:
+						if not in_turn:
+							ants.begin_update()
+							in_turn = True
+						ants.parse_line(line)
+					elif key == 'go':
+						if not in_turn:
+							ants.begin_update()
+						in_turn = False
+						now = time.time()
+						ants.turn_start_time = self.turn_start
+						ants.parse_time += now - parse_start
+						parse_start = now
+						self.turn_start = None
+						self.events.put(('go', ended))
+					elif key == 'en' and line.lower() == 'end':
+						ended = True
+					elif key == 're' and line.lower() == 'ready':
+						setup_done = True
+						self.events.put(('ready',))
+					elif not setup_done:
+						ants.setup_line(line)
+				except:
+					traceback.print_exc(file=sys.stderr)
+					sys.stderr.flush()
+			ants.parse_time += time.time() - parse_start
+		self.events.put(('eof',))
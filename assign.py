@@ -0,0 +1,164 @@
+#!/usr/bin/env python
+
+from collections import defaultdict
+from math import sqrt
+
+from spatial import SpatialIndex
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# matches ants to targets. Only the k nearest ants of every target and the k
+# nearest targets of every ant are scored with the (possibly expensive)
+# distance function; numpy finds them from the whole wrapped manhattan
+# distance matrix at once, without it they come from walking rings of
+# buckets. The scored pairs are matched greedily, shortest first,
+# and the matching is then improved by swapping the targets of two ants
+# whenever that shortens their total distance. Ants and targets left over are
+# matched among themselves in another pass.
+
+class Assigner:
+    def __init__(self, rows, cols, k=4):
+        self.rows = rows
+        self.cols = cols
+        self.k = k
+        # the distances looked up by the last solve
+        self.scored = 0
+
+    def manhattan(self, loc1, loc2):
+        d_row = abs(loc1[0] - loc2[0])
+        d_col = abs(loc1[1] - loc2[1])
+        return min(d_row, self.rows - d_row) + min(d_col, self.cols - d_col)
+
+    def buckets(self, locs, per_bucket=4):
+        'a spatial index with buckets sized to hold about per_bucket of locs each'
+        size = int(sqrt(self.rows * self.cols * per_bucket / float(max(len(locs), 1))))
+        index = SpatialIndex(self.rows, self.cols, size=size)
+        index.build(locs)
+        return index
+
+    def candidates(self, ants, targets, max_dist):
+        '''the k nearest ants of each target and the k nearest targets of each ant,
+        as a dict of (ant, target) -> wrapped manhattan distance'''
+        k = self.k
+        pairs = {}
+        if len(ants) * len(targets) <= 16 * k * k:
+            # too few to be worth bucketing
+            for ant in ants:
+                for target in targets:
+                    dist = self.manhattan(ant, target)
+                    if max_dist is None or dist <= max_dist:
+                        pairs[(ant, target)] = dist
+            return pairs
+        if numpy is not None:
+            return self.candidates_numpy(ants, targets, max_dist)
+        ant_buckets = self.buckets(ants)
+        target_buckets = self.buckets(targets)
+        for target in targets:
+            for dist, ant in ant_buckets.nearest(target, k, max_dist):
+                pairs[(ant, target)] = dist
+        for ant in ants:
+            for dist, target in target_buckets.nearest(ant, k, max_dist):
+                pairs[(ant, target)] = dist
+        return pairs
+
+    def candidates_numpy(self, ants, targets, max_dist):
+        ant_array = numpy.array(ants, dtype=numpy.int32)
+        target_array = numpy.array(targets, dtype=numpy.int32)
+        d_row = numpy.abs(ant_array[:, 0, None] - target_array[None, :, 0])
+        d_col = numpy.abs(ant_array[:, 1, None] - target_array[None, :, 1])
+        dist = numpy.minimum(d_row, self.rows - d_row) + numpy.minimum(d_col, self.cols - d_col)
+        k_targets = min(self.k, len(targets))
+        k_ants = min(self.k, len(ants))
+        # column j of by_target holds the k nearest ants of target j
+        by_ant = numpy.argpartition(dist, k_targets - 1, axis=1)[:, :k_targets]
+        by_target = numpy.argpartition(dist, k_ants - 1, axis=0)[:k_ants, :]
+        ant_index = numpy.concatenate((numpy.repeat(numpy.arange(len(ants)), k_targets), by_target.ravel()))
+        target_index = numpy.concatenate((by_ant.ravel(), numpy.tile(numpy.arange(len(targets)), k_ants)))
+        pair_dist = dist[ant_index, target_index]
+        if max_dist is not None:
+            near = pair_dist <= max_dist
+            ant_index = ant_index[near]
+            target_index = target_index[near]
+            pair_dist = pair_dist[near]
+        return dict(((ants[i], targets[j]), d) for i, j, d in
+                    zip(ant_index.tolist(), target_index.tolist(), pair_dist.tolist()))
+
+    def solve(self, ants, targets, distance=None, max_dist=None, capacity=1, rounds=3, passes=3):
+        '''pairs of ants and targets as a list of (distance, ant, target) sorted by
+        distance. Every ant is used once and every target at most capacity times,
+        capacity None sends each ant to its own nearest target. distance(ant, target)
+        defaults to the wrapped manhattan distance; None or a negative value marks
+        a target the ant cannot reach. max_dist limits the manhattan distance of
+        the pairs considered.'''
+        ants = list(ants)
+        targets = list(targets)
+        cost = {}
+        owner = {}
+        load = defaultdict(int)
+        self.scored = 0
+        for attempt in range(passes):
+            if not ants or not targets:
+                break
+            pairs = []
+            for (ant, target), dist in self.candidates(ants, targets, max_dist).items():
+                if (ant, target) in cost:
+                    continue
+                if distance is not None:
+                    dist = distance(ant, target)
+                self.scored += 1
+                if dist is not None and dist >= 0:
+                    cost[(ant, target)] = dist
+                    pairs.append((dist, ant, target))
+            pairs.sort()
+            matched = len(owner)
+            for dist, ant, target in pairs:
+                if ant in owner:
+                    continue
+                if capacity is not None and load[target] >= capacity:
+                    continue
+                owner[ant] = target
+                load[target] += 1
+            if capacity is None or len(owner) == matched:
+                break
+            ants = [ant for ant in ants if ant not in owner]
+            targets = [target for target in targets if load[target] < capacity]
+
+        if capacity is not None:
+            self.improve(owner, cost, rounds)
+        result = [(cost[(ant, target)], ant, target) for ant, target in owner.items()]
+        result.sort()
+        return result
+
+    def improve(self, owner, cost, rounds):
+        'two ants trade targets when both pairs were scored and it is shorter overall'
+        options = defaultdict(list)
+        for ant, target in cost:
+            options[ant].append(target)
+        holders = defaultdict(set)
+        for ant, target in owner.items():
+            holders[target].add(ant)
+        for round in range(rounds):
+            swapped = False
+            for ant in list(owner):
+                mine = owner[ant]
+                for target in options[ant]:
+                    if target == mine:
+                        continue
+                    for other in list(holders[target]):
+                        if (other, mine) not in cost:
+                            continue
+                        if cost[(ant, target)] + cost[(other, mine)] < cost[(ant, mine)] + cost[(other, target)]:
+                            owner[ant] = target
+                            owner[other] = mine
+                            holders[mine].discard(ant)
+                            holders[mine].add(other)
+                            holders[target].discard(other)
+                            holders[target].add(ant)
+                            mine = target
+                            swapped = True
+                            break
+            if not swapped:
+                break
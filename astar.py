@@ -0,0 +1,276 @@
+#!/usr/bin/env python
+
+from heapq import heappush, heappop
+
+# cells are addressed by their flat index, row*cols + col. Every per-cell table
+# below is a plain list sized rows*cols and is reused between searches; a cell's
+# g score and parent only count for the current search when its stamp matches.
+
+class AStar:
+    def __init__(self, rows, cols, water=None, neighbors=None):
+        self.rows = rows
+        self.cols = cols
+        size = rows * cols
+        # water is 1 for every cell known to be impassable
+        if water is None:
+            water = bytearray(size)
+        self.water = water
+        self.locs = [(row, col) for row in range(rows) for col in range(cols)]
+        self.row_of = [row for row in range(rows) for col in range(cols)]
+        self.col_of = [col for row in range(rows) for col in range(cols)]
+        # the n, e, s, w neighbor indexes of each cell, Ants.neighbor_index if given
+        if neighbors is None:
+            neighbors = []
+            for row in range(rows):
+                for col in range(cols):
+                    neighbors.append((((row - 1) % rows) * cols + col,
+                                      row * cols + (col + 1) % cols,
+                                      ((row + 1) % rows) * cols + col,
+                                      row * cols + (col - 1) % cols))
+        self.neighbors = neighbors
+        self.g = [0] * size
+        self.parent = [-1] * size
+        self.opened = [0] * size
+        self.closed = [0] * size
+        self.search_id = 0
+        # expanded is the node count of the last search, the totals run until reset_stats
+        self.expanded = 0
+        self.total_expanded = 0
+        self.calls = 0
+        # the Search left by the last search(resumable=True) that ran out of time
+        self.suspended = None
+
+    def index(self, loc):
+        row, col = loc
+        return row * self.cols + col
+
+    def block(self, loc):
+        'mark a location as water'
+        row, col = loc
+        self.water[row * self.cols + col] = 1
+
+    def unblock(self, loc):
+        row, col = loc
+        self.water[row * self.cols + col] = 0
+
+    def reset_stats(self):
+        self.total_expanded = 0
+        self.calls = 0
+
+    def heuristic(self, i, dest_row, dest_col, weight):
+        d_row = abs(self.row_of[i] - dest_row)
+        d_col = abs(self.col_of[i] - dest_col)
+        return int((min(d_row, self.rows - d_row) + min(d_col, self.cols - d_col)) * weight)
+
+    def search(self, start_loc, dest, time_remaining, threshold, joins=None, weight=0.9, resumable=False):
+        '''return the path from start_loc to dest as a list of locations, start excluded.
+        The search also stops at the first location for which joins(loc) is true.
+        None is returned when dest is unreachable or when g*threshold exceeds the time left,
+        in the latter case a resumable search leaves its state in self.suspended.'''
+        rows = self.rows
+        cols = self.cols
+        water = self.water
+        neighbors = self.neighbors
+        row_of = self.row_of
+        col_of = self.col_of
+        locs = self.locs
+        g = self.g
+        parent = self.parent
+        opened = self.opened
+        closed = self.closed
+        self.search_id += 1
+        sid = self.search_id
+        self.calls += 1
+        self.suspended = None
+
+        start = self.index(start_loc)
+        goal = self.index(dest)
+        dest_row, dest_col = dest
+        g[start] = 0
+        parent[start] = -1
+        opened[start] = sid
+        # heap entries are (f, -g, index) so ties on f go to the deeper node
+        frontier = [(self.heuristic(start, dest_row, dest_col, weight), 0, start)]
+        touched = [start]
+        expanded = 0
+        found = -1
+        while frontier:
+            f, gc, i = heappop(frontier)
+            gc = -gc
+            if closed[i] == sid or gc > g[i]:
+                continue
+            if i == goal or (joins is not None and i != start and joins(locs[i])):
+                found = i
+                break
+            closed[i] = sid
+            expanded += 1
+            # polling the clock on every node costs more than the nodes themselves
+            if not expanded & 15 and gc * threshold > time_remaining():
+                if resumable:
+                    # i is closed but its neighbors were never pushed
+                    closed[i] = 0
+                    heappush(frontier, (f, -gc, i))
+                    self.suspended = Search(self, start, goal, weight, frontier,
+                                            dict((j, g[j]) for j in touched),
+                                            dict((j, parent[j]) for j in touched),
+                                            set(j for j in touched if closed[j] == sid))
+                break
+            gp = gc + 1
+            for j in neighbors[i]:
+                if water[j] or closed[j] == sid:
+                    continue
+                if opened[j] == sid and g[j] <= gp:
+                    continue
+                opened[j] = sid
+                g[j] = gp
+                parent[j] = i
+                touched.append(j)
+                d_row = abs(row_of[j] - dest_row)
+                d_col = abs(col_of[j] - dest_col)
+                h = int((min(d_row, rows - d_row) + min(d_col, cols - d_col)) * weight)
+                heappush(frontier, (gp + h, -gp, j))
+        self.expanded = expanded
+        self.total_expanded += expanded
+        if found < 0:
+            return None
+        path = []
+        i = found
+        while i != start:
+            path.append(locs[i])
+            i = parent[i]
+        path.reverse()
+        return path
+
+
+class Search:
+    '''an A* search that ran out of time, carried on with run() on a later call.
+    It keeps its own g, parent and closed tables so other searches can use the
+    AStar tables meanwhile. The tree stays rooted where the search started,
+    trail is the walk of the ant from that root to where it is now.'''
+    def __init__(self, astar, start, goal, weight, frontier, g, parent, closed):
+        self.astar = astar
+        self.goal = goal
+        self.dest = astar.locs[goal]
+        self.weight = weight
+        self.frontier = frontier
+        self.g = g
+        self.parent = parent
+        self.closed = closed
+        self.trail = [start]
+        self.done = False
+        self.expanded = 0
+        dest_row, dest_col = self.dest
+        self.best = start
+        best_key = (astar.heuristic(start, dest_row, dest_col, weight), 0)
+        for i in closed:
+            key = (astar.heuristic(i, dest_row, dest_col, weight), g[i])
+            if key < best_key:
+                self.best = i
+                best_key = key
+
+    def position(self):
+        return self.astar.locs[self.trail[-1]]
+
+    def crosses(self, loc):
+        'whether the search has reached loc'
+        return self.astar.index(loc) in self.g
+
+    def reroot(self, loc):
+        '''follow the ant one step, into the tree or back along the trail.
+        False when the step leaves the tree and the search is no use any more.'''
+        i = self.astar.index(loc)
+        trail = self.trail
+        if len(trail) > 1 and trail[-2] == i:
+            trail.pop()
+        elif i in self.closed and self.parent[i] == trail[-1]:
+            trail.append(i)
+        else:
+            return False
+        return True
+
+    def path_to(self, i):
+        'the locations from the current position to cell i of the tree'
+        chain = []
+        while i >= 0:
+            chain.append(i)
+            i = self.parent[i]
+        chain.reverse()
+        trail = self.trail
+        m = 0
+        while m + 1 < len(trail) and m + 1 < len(chain) and trail[m + 1] == chain[m + 1]:
+            m += 1
+        locs = self.astar.locs
+        return [locs[j] for j in trail[m:-1][::-1]] + [locs[j] for j in chain[m + 1:]]
+
+    def best_path(self):
+        'the path to the closed cell that looks nearest the goal'
+        return self.path_to(self.best)
+
+    def run(self, time_remaining, threshold, joins=None):
+        '''continue the search, returns the path from the current position as
+        search() does. None with done set means dest is unreachable, None
+        without it means time ran out again.'''
+        astar = self.astar
+        rows = astar.rows
+        cols = astar.cols
+        water = astar.water
+        neighbors = astar.neighbors
+        row_of = astar.row_of
+        col_of = astar.col_of
+        locs = astar.locs
+        g = self.g
+        parent = self.parent
+        closed = self.closed
+        frontier = self.frontier
+        weight = self.weight
+        goal = self.goal
+        root = self.trail[0]
+        dest_row, dest_col = self.dest
+        astar.calls += 1
+        best = self.best
+        best_h = astar.heuristic(best, dest_row, dest_col, weight)
+        base = None
+        expanded = 0
+        found = -1
+        while frontier:
+            f, gc, i = heappop(frontier)
+            gc = -gc
+            if i in closed or gc > g[i]:
+                continue
+            if i == goal or (joins is not None and i != root and joins(locs[i])):
+                found = i
+                break
+            # like search() but only the depth gained on this call counts against the time
+            if base is None:
+                base = gc
+            if not expanded & 15 and expanded and (gc - base) * threshold > time_remaining():
+                heappush(frontier, (f, -gc, i))
+                break
+            closed.add(i)
+            expanded += 1
+            if f - gc < best_h:
+                best = i
+                best_h = f - gc
+            gp = gc + 1
+            for j in neighbors[i]:
+                if water[j] or j in closed:
+                    continue
+                gj = g.get(j)
+                if gj is not None and gj <= gp:
+                    continue
+                g[j] = gp
+                parent[j] = i
+                d_row = abs(row_of[j] - dest_row)
+                d_col = abs(col_of[j] - dest_col)
+                h = int((min(d_row, rows - d_row) + min(d_col, cols - d_col)) * weight)
+                heappush(frontier, (gp + h, -gp, j))
+        else:
+            self.done = True
+        self.best = best
+        self.expanded += expanded
+        astar.expanded = expanded
+        astar.total_expanded += expanded
+        if found < 0:
+            return None
+        self.done = True
+        return self.path_to(found)
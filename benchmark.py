@@ -0,0 +1,300 @@
+#!/usr/bin/env python
+
+import os
+import sys
+import glob
+import json
+import time
+import random
+import shutil
+import tempfile
+import subprocess
+
+from engine import Game, InProcessBot
+from astar import AStar
+from jps import JumpPoint
+
+# turn time benchmarks for the bot variants on synthetic maps. Every run plays
+# a short local game against a bot that never moves, with the benchmarked
+# player starting from a scripted ant population, and records how long each
+# do_turn took and how much of the turn was left. With --compare-search it
+# instead times the find_path searches alone on the same maps. The games run
+# in a scratch directory with snapshots and profiles off, so no run warm
+# starts from what an earlier one learned.
+
+SIZES = (50, 100, 150, 200)
+KINDS = ('open', 'maze', 'cave')
+POPULATIONS = (10, 100, 300, 1000)
+
+def open_map(rows, cols, rng, density=0.1):
+    'scattered single water squares'
+    return set((row, col) for row in range(rows) for col in range(cols)
+               if rng.random() < density)
+
+def maze_map(rows, cols, rng, density=0.1, cell=4):
+    'a wrapping maze of corridors cell-1 wide carved by a random depth first walk'
+    cell_rows = max(rows // cell, 2)
+    cell_cols = max(cols // cell, 2)
+    water = set((row, col) for row in range(rows) for col in range(cols)
+                if row % cell == 0 or col % cell == 0)
+    visited = set([(0, 0)])
+    stack = [(0, 0)]
+    while stack:
+        c_row, c_col = stack[-1]
+        options = []
+        for d_row, d_col in ((-1, 0), (0, 1), (1, 0), (0, -1)):
+            adj = ((c_row + d_row) % cell_rows, (c_col + d_col) % cell_cols)
+            if adj not in visited:
+                options.append((d_row, d_col, adj))
+        if not options:
+            stack.pop()
+            continue
+        d_row, d_col, adj = rng.choice(options)
+        # knock down the wall between the two cells
+        for i in range(1, cell):
+            if d_row:
+                wall_row = (c_row * cell + (cell if d_row > 0 else 0)) % rows
+                water.discard((wall_row, (c_col * cell + i) % cols))
+            else:
+                wall_col = (c_col * cell + (cell if d_col > 0 else 0)) % cols
+                water.discard(((c_row * cell + i) % rows, wall_col))
+        visited.add(adj)
+        stack.append(adj)
+    # open a few extra gaps so the maze has loops
+    for loc in list(water):
+        if rng.random() < density:
+            water.discard(loc)
+    return water
+
+def cave_map(rows, cols, rng, density=0.4, steps=4):
+    'cellular automaton caves, squares with 5 or more water neighbors become water'
+    water = open_map(rows, cols, rng, density)
+    for step in range(steps):
+        new_water = set()
+        for row in range(rows):
+            for col in range(cols):
+                count = 0
+                for d_row in (-1, 0, 1):
+                    for d_col in (-1, 0, 1):
+                        if ((row + d_row) % rows, (col + d_col) % cols) in water:
+                            count += 1
+                if count >= 5:
+                    new_water.add((row, col))
+        water = new_water
+    return water
+
+GENERATORS = {'open': open_map, 'maze': maze_map, 'cave': cave_map}
+# the water density of each kind when none is asked for
+DENSITIES = {'open': 0.1, 'maze': 0.1, 'cave': 0.4}
+
+def make_map(kind, rows, cols, ants, seed=0, density=None):
+    'a two player engine map with a scripted population of player 0 ants'
+    rng = random.Random(seed)
+    if density is None:
+        density = DENSITIES[kind]
+    water = GENERATORS[kind](rows, cols, rng, density)
+    hills = {(rows // 4, cols // 4): 0, ((3 * rows) // 4, (3 * cols) // 4): 1}
+    # clear the water around the hills so both players can get out
+    for (h_row, h_col) in hills:
+        for d_row in range(-2, 3):
+            for d_col in range(-2, 3):
+                water.discard(((h_row + d_row) % rows, (h_col + d_col) % cols))
+    land = [(row, col) for row in range(rows) for col in range(cols)
+            if (row, col) not in water and (row, col) not in hills]
+    rng.shuffle(land)
+    population = {}
+    for loc in land[:ants]:
+        population[loc] = 0
+    # a few enemies to fight and track
+    for loc in land[ants:ants + max(ants // 10, 1)]:
+        population[loc] = 1
+    food = set(land[ants + ants // 10 + 1:ants + ants // 10 + 1 + (rows * cols) // 200])
+    return {'rows': rows, 'cols': cols, 'players': 2,
+            'water': water, 'food': food, 'ants': population, 'hills': hills}
+
+
+class HoldBot:
+    'never gives an order'
+    def do_setup(self, ants):
+        pass
+
+    def do_turn(self, ants):
+        pass
+
+
+def load_source(name, path):
+    try:
+        import importlib.util
+        spec = importlib.util.spec_from_file_location(name, path)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        return module
+    except ImportError:
+        import imp
+        return imp.load_source(name, path)
+
+def load_extension(name, path):
+    try:
+        import importlib.machinery
+        import importlib.util
+        loader = importlib.machinery.ExtensionFileLoader(name, path)
+        spec = importlib.util.spec_from_file_location(name, path, loader=loader)
+        module = importlib.util.module_from_spec(spec)
+        loader.exec_module(module)
+        return module
+    except ImportError:
+        import imp
+        return imp.load_dynamic(name, path)
+
+def bot_variants():
+    'name -> MyBot class for every variant available here'
+    here = os.path.dirname(os.path.abspath(__file__))
+    variants = {}
+    frozenants10 = load_source('frozenants10', os.path.join(here, 'frozenants10.py'))
+    variants['frozenants10'] = lambda: frozenants10.MyBot(profile=None, snapshots=None)
+    variants['frozenants10_jps'] = lambda: frozenants10.MyBot(search_mode='jps', profile=None,
+                                                              snapshots=None)
+    # frozenants.py is loaded by path, a built frozenants extension would shadow it on import
+    variants['frozenants'] = load_source('frozenants_py', os.path.join(here, 'frozenants.py')).MyBot
+    built = glob.glob(os.path.join(here, 'frozenants*.so')) + glob.glob(os.path.join(here, 'frozenants*.pyd'))
+    if built:
+        variants['frozenants_cython'] = load_extension('frozenants', built[0]).MyBot
+    return variants
+
+def percentile(values, fraction):
+    if not values:
+        return None
+    values = sorted(values)
+    return round(values[min(len(values) - 1, int(fraction * len(values)))], 3)
+
+def run_one(bot_class, kind, size, ants, turns, turntime, seed, density=None):
+    if density is None:
+        density = DENSITIES[kind]
+    game_map = make_map(kind, size, size, ants, seed, density)
+    game = Game(game_map, turns=turns, turntime=turntime, seed=seed)
+    bot = InProcessBot(bot_class())
+    start = time.time()
+    result = game.run([bot, InProcessBot(HoldBot())])
+    turn_ms = result['turn_ms'][0]
+    return {'map': kind,
+            'size': size,
+            'density': density,
+            'ants': ants,
+            'turns': len(turn_ms),
+            'game_s': round(time.time() - start, 3),
+            'turn_ms': [round(t, 3) for t in turn_ms],
+            'mean_ms': round(sum(turn_ms) / max(len(turn_ms), 1), 3),
+            'p50_ms': percentile(turn_ms, 0.5),
+            'p99_ms': percentile(turn_ms, 0.99),
+            'max_ms': round(max(turn_ms), 3) if turn_ms else None,
+            'min_remaining_ms': min(bot.remaining) if bot.remaining else None,
+            'remaining_ms': bot.remaining,
+            'timeouts': result['timeouts'][0],
+            'timed_out': result['timed_out'][0],
+            'errors': bot.errors,
+            'last_error': bot.last_error}
+
+def compare_searches(kind, size, queries, seed=0, density=None):
+    'nodes expanded and wall time of A* and JPS over the same random queries'
+    if density is None:
+        density = DENSITIES[kind]
+    rng = random.Random(seed)
+    astar = AStar(size, size)
+    for loc in GENERATORS[kind](size, size, rng, density):
+        astar.block(loc)
+    searches = (('astar', astar), ('jps', JumpPoint(size, size, astar.water, astar.neighbors)))
+    land = [(row, col) for row in range(size) for col in range(size)
+            if not astar.water[row * size + col]]
+    pairs = [(rng.choice(land), rng.choice(land)) for query in range(queries)]
+    no_deadline = lambda: 1 << 30
+    result = {'map': kind, 'size': size, 'density': density, 'queries': queries}
+    for name, search in searches:
+        nodes = 0
+        steps = 0
+        found = 0
+        start = time.time()
+        for start_loc, dest in pairs:
+            path = search.search(start_loc, dest, no_deadline, 0)
+            nodes += search.expanded
+            if path is not None:
+                found += 1
+                steps += len(path)
+        result[name] = {'nodes': nodes,
+                        'ms': round(1000 * (time.time() - start), 3),
+                        'found': found,
+                        'path_steps': steps}
+    return result
+
+def git_commit():
+    try:
+        here = os.path.dirname(os.path.abspath(__file__))
+        return subprocess.check_output(['git', 'rev-parse', 'HEAD'], cwd=here).decode('ascii').strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def run_all(args):
+    variants = bot_variants()
+    names = [] if args.compare_search else args.bots or sorted(variants)
+    results = []
+    if args.compare_search:
+        for kind in args.kinds:
+            for density in args.densities:
+                for size in args.sizes:
+                    run = compare_searches(kind, size, args.queries, args.seed, density)
+                    results.append(run)
+                    sys.stderr.write('%s %s %sx%s: astar %s nodes %s ms, jps %s nodes %s ms\n' % (
+                        kind, run['density'], size, size, run['astar']['nodes'], run['astar']['ms'],
+                        run['jps']['nodes'], run['jps']['ms']))
+    for name in names:
+        for kind in args.kinds:
+            for density in args.densities:
+                for size in args.sizes:
+                    for ants in args.ants:
+                        run = run_one(variants[name], kind, size, ants, args.turns, args.turntime,
+                                      args.seed, density)
+                        run['bot'] = name
+                        results.append(run)
+                        sys.stderr.write('%s %s %s %sx%s %s ants: p50 %s ms, p99 %s ms, %s timeouts, %s errors\n' % (
+                            name, kind, run['density'], size, size, ants, run['p50_ms'], run['p99_ms'],
+                            run['timeouts'], run['errors']))
+    return results
+
+def main(argv):
+    import argparse
+    parser = argparse.ArgumentParser(description='benchmark do_turn across maps and ant counts')
+    parser.add_argument('--bots', nargs='*', help='variants to run, default all available')
+    parser.add_argument('--kinds', nargs='*', default=list(KINDS), choices=KINDS)
+    parser.add_argument('--sizes', nargs='*', type=int, default=list(SIZES))
+    parser.add_argument('--ants', nargs='*', type=int, default=list(POPULATIONS))
+    parser.add_argument('--densities', nargs='*', type=float, default=[None],
+                        help='water densities, default the usual one of each map kind')
+    parser.add_argument('--turns', type=int, default=20)
+    parser.add_argument('--turntime', type=int, default=500)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', default='benchmark.json')
+    parser.add_argument('--compare-search', action='store_true',
+                        help='time A* against JPS on the maps instead of playing games')
+    parser.add_argument('--queries', type=int, default=200)
+    args = parser.parse_args(argv)
+    output_path = os.path.abspath(args.output)
+
+    # the bots write their logs to the working directory, keep them out of the way
+    cwd = os.getcwd()
+    scratch = tempfile.mkdtemp(prefix='benchmark-')
+    os.chdir(scratch)
+    try:
+        results = run_all(args)
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(scratch, ignore_errors=True)
+    report = {'commit': git_commit(),
+              'python': sys.version.split()[0],
+              'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+              'settings': vars(args),
+              'results': results}
+    output = open(output_path, 'w')
+    json.dump(report, output, indent=1, sort_keys=True)
+    output.close()
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,133 @@
+#!/usr/bin/env python
+
+import time
+
+# monotonic on python 3, python 2 falls back to the wall clock
+clock = getattr(time, 'monotonic', time.time)
+
+# phases in the order do_turn runs them with their share of the turn. Each
+# phase is given its weight's share of whatever is left when it starts, so
+# time an earlier phase did not use goes to the later ones.
+PHASES = (('hills', 3),
+          ('food', 3),
+          ('bookkeeping', 1),
+          ('explore', 2),
+          ('fallback', 1))
+
+
+class Deadline:
+    '''the end of one phase. expired() is cheap enough for inner loops, it
+    only reads the clock again once the polls seen so far say that half of
+    the time left could have passed, and the gap between reads at most
+    doubles each time.'''
+    def __init__(self, name, end, max_skip=8):
+        self.name = name
+        self.end = end
+        self.max_skip = max_skip
+        self.polls = 0
+        self.next_poll = 0
+        self.skip = 1
+        self.last_polls = 0
+        self.last_time = clock()
+        self.done = False
+
+    def remaining(self):
+        'milliseconds left, reads the clock every call and counts for expired() too'
+        left = int(1000 * (self.end - clock()))
+        if left <= 0:
+            self.done = True
+        return left
+
+    def expired(self):
+        if self.done:
+            return True
+        self.polls += 1
+        if self.polls < self.next_poll:
+            return False
+        now = clock()
+        if now >= self.end:
+            self.done = True
+            return True
+        elapsed = now - self.last_time
+        skip = 2 * self.skip
+        if elapsed > 0:
+            rate = (self.polls - self.last_polls) / elapsed
+            skip = min(skip, int(rate * (self.end - now) / 2))
+        self.skip = max(1, min(skip, self.max_skip))
+        self.next_poll = self.polls + self.skip
+        self.last_polls = self.polls
+        self.last_time = now
+        return False
+
+
+class Budget:
+    '''splits the turn time among the PHASES and keeps reserve milliseconds
+    back for giving the last orders. A turn that still ends past the budget
+    adds its overrun to a margin held back on top of the reserve, which
+    shrinks again by a tenth every turn that fits.'''
+    def __init__(self, turntime, phases=PHASES, reserve=None):
+        self.turntime = turntime
+        self.phases = phases
+        if reserve is None:
+            reserve = min(50, turntime // 10)
+        self.reserve = reserve
+        self.margin = 0.0
+        self.end = None
+        self.current = None
+        self.started = None
+        self.allocated = {}
+        self.used = {}
+        self.overrun_ms = {}
+        self.overruns = {}
+        self.turn_overruns = 0
+
+    def start(self, turn_start_time):
+        'begin a turn, turn_start_time is the wall clock time the turn began'
+        elapsed = time.time() - turn_start_time
+        self.end = clock() - elapsed + (self.turntime - self.reserve - self.margin) / 1000.0
+        self.current = None
+        self.allocated = {}
+        self.used = {}
+        self.overrun_ms = {}
+
+    def remaining(self):
+        'milliseconds left in the turn, less the reserve'
+        return int(1000 * (self.end - clock()))
+
+    def close(self, now):
+        deadline = self.current
+        if deadline is None:
+            return
+        self.used[deadline.name] = round(self.used.get(deadline.name, 0) + 1000 * (now - self.started), 3)
+        if now > deadline.end:
+            self.overruns[deadline.name] = self.overruns.get(deadline.name, 0) + 1
+            self.overrun_ms[deadline.name] = round(1000 * (now - deadline.end), 3)
+        self.current = None
+
+    def phase(self, name):
+        'end the running phase and hand out the deadline for the named one'
+        now = clock()
+        self.close(now)
+        names = [phase for phase, weight in self.phases]
+        weights = [weight for phase, weight in self.phases]
+        i = names.index(name)
+        share = max(self.end - now, 0) * weights[i] / float(sum(weights[i:]))
+        self.current = Deadline(name, now + share)
+        self.started = now
+        self.allocated[name] = round(self.allocated.get(name, 0) + 1000 * share, 3)
+        return self.current
+
+    def finish(self):
+        'close the turn, returns what each phase was given, used and overran'
+        now = clock()
+        self.close(now)
+        if now > self.end:
+            self.turn_overruns += 1
+            self.margin = min(self.margin + 1000 * (now - self.end), self.turntime / 2.0)
+        else:
+            self.margin *= 0.9
+        return {'allocated_ms': self.allocated,
+                'used_ms': self.used,
+                'overrun_ms': self.overrun_ms,
+                'left_ms': round(1000 * (self.end - now), 3),
+                'margin_ms': round(self.margin, 3)}
@@ -0,0 +1,205 @@
+#!/usr/bin/env python
+
+from array import array
+from libc.stdlib cimport malloc, free
+from libc.string cimport memset
+
+# the search kernels of pykernels over typed memoryviews and C arrays, built
+# with setup_kernels.py. Same functions, same results, tie breaks included;
+# import them through kernels, which falls back to pykernels without this.
+
+cdef struct Node:
+	int f
+	int g
+	int i
+
+cdef inline bint before(Node a, Node b):
+	# the order of the (f, -g, index) tuples pykernels keeps on its heap
+	if a.f != b.f:
+		return a.f < b.f
+	if a.g != b.g:
+		return a.g > b.g
+	return a.i < b.i
+
+cdef inline void heap_push(Node *heap, int *count, Node node):
+	cdef int k = count[0]
+	cdef int p
+	count[0] += 1
+	while k > 0:
+		p = (k - 1) >> 1
+		if not before(node, heap[p]):
+			break
+		heap[k] = heap[p]
+		k = p
+	heap[k] = node
+
+cdef inline Node heap_pop(Node *heap, int *count):
+	cdef Node top = heap[0]
+	cdef Node last
+	cdef int k = 0
+	cdef int c
+	count[0] -= 1
+	last = heap[count[0]]
+	while True:
+		c = 2 * k + 1
+		if c >= count[0]:
+			break
+		if c + 1 < count[0] and before(heap[c + 1], heap[c]):
+			c += 1
+		if not before(heap[c], last):
+			break
+		heap[k] = heap[c]
+		k = c
+	heap[k] = last
+	return top
+
+cdef inline void around(int i, int rows, int cols, int *out):
+	cdef int row = i // cols
+	cdef int col = i % cols
+	out[0] = ((row - 1 + rows) % rows) * cols + col
+	out[1] = row * cols + (col + 1) % cols
+	out[2] = ((row + 1) % rows) * cols + col
+	out[3] = row * cols + (col - 1 + cols) % cols
+
+def bfs(int rows, int cols, const unsigned char[:] water, sources, int limit=-1):
+	'''(dist, nearest) arrays of the steps from every cell to the nearest of the
+	source cells and which source that is, -1 where none is in reach. limit
+	bounds the steps searched when not negative.'''
+	cdef int size = rows * cols
+	dist_array = array('i', [-1]) * size
+	nearest_array = array('i', [-1]) * size
+	cdef int[:] dist = dist_array
+	cdef int[:] nearest = nearest_array
+	cdef int *queue = <int *>malloc(size * sizeof(int))
+	cdef int head = 0
+	cdef int tail = 0
+	cdef int i, j, k, d, source
+	cdef int adjacent[4]
+	try:
+		for i in sources:
+			if dist[i] < 0:
+				dist[i] = 0
+				nearest[i] = i
+				queue[tail] = i
+				tail += 1
+		while head < tail:
+			i = queue[head]
+			head += 1
+			d = dist[i] + 1
+			if 0 <= limit < d:
+				continue
+			source = nearest[i]
+			around(i, rows, cols, adjacent)
+			for k in range(4):
+				j = adjacent[k]
+				if dist[j] < 0 and not water[j]:
+					dist[j] = d
+					nearest[j] = source
+					queue[tail] = j
+					tail += 1
+	finally:
+		free(queue)
+	return dist_array, nearest_array
+
+def astar(int rows, int cols, const unsigned char[:] water, int start, int goal, double weight=1.0):
+	'''the cells from start to goal, start excluded, None when goal cannot be
+	reached. The heuristic is the wrapped manhattan distance times weight and
+	ties on f go to the deeper cell, then to the lower index.'''
+	cdef int size = rows * cols
+	cdef int *g = <int *>malloc(size * sizeof(int))
+	cdef int *parent = <int *>malloc(size * sizeof(int))
+	cdef unsigned char *closed = <unsigned char *>malloc(size)
+	# every cell is pushed at most once per neighbor that improves it, and once as start
+	cdef Node *heap = <Node *>malloc((4 * size + 1) * sizeof(Node))
+	cdef int count = 0
+	cdef int goal_row = goal // cols
+	cdef int goal_col = goal % cols
+	cdef int i, j, k, gp, d_row, d_col
+	cdef int adjacent[4]
+	cdef Node node
+	path = None
+	try:
+		for i in range(size):
+			g[i] = -1
+			parent[i] = -1
+		memset(closed, 0, size)
+		g[start] = 0
+		d_row = abs(start // cols - goal_row)
+		d_col = abs(start % cols - goal_col)
+		node.f = <int>((min(d_row, rows - d_row) + min(d_col, cols - d_col)) * weight)
+		node.g = 0
+		node.i = start
+		heap_push(heap, &count, node)
+		while count > 0:
+			node = heap_pop(heap, &count)
+			i = node.i
+			if closed[i] or node.g > g[i]:
+				continue
+			if i == goal:
+				path = []
+				while i != start:
+					path.append(i)
+					i = parent[i]
+				path.reverse()
+				break
+			closed[i] = 1
+			gp = node.g + 1
+			around(i, rows, cols, adjacent)
+			for k in range(4):
+				j = adjacent[k]
+				if water[j] or closed[j]:
+					continue
+				if 0 <= g[j] <= gp:
+					continue
+				g[j] = gp
+				parent[j] = i
+				d_row = abs(j // cols - goal_row)
+				d_col = abs(j % cols - goal_col)
+				node.f = gp + <int>((min(d_row, rows - d_row) + min(d_col, cols - d_col)) * weight)
+				node.g = gp
+				node.i = j
+				heap_push(heap, &count, node)
+	finally:
+		free(g)
+		free(parent)
+		free(closed)
+		free(heap)
+	return path
+
+def diffuse(int rows, int cols, const unsigned char[:] water, int source, int value, int cost, int inc, int[:] out):
+	'''add value + cost*d + inc*d*(d-1)/2 to out at every cell d steps from
+	source, out to the first distance where that is no longer positive. out is
+	a writable int sequence, array('i') for ckernels. Returns the cells reached.'''
+	cdef int size = rows * cols
+	cdef unsigned char *seen = <unsigned char *>malloc(size)
+	cdef int *queue = <int *>malloc(size * sizeof(int))
+	cdef int head = 0
+	cdef int tail = 1
+	cdef int level_end, i, j, k, v
+	cdef int d = 0
+	cdef int adjacent[4]
+	try:
+		memset(seen, 0, size)
+		seen[source] = 1
+		queue[0] = source
+		while head < tail:
+			v = value + cost * d + inc * (d * (d - 1) // 2)
+			if v <= 0:
+				break
+			level_end = tail
+			while head < level_end:
+				i = queue[head]
+				head += 1
+				out[i] += v
+				around(i, rows, cols, adjacent)
+				for k in range(4):
+					j = adjacent[k]
+					if not seen[j] and not water[j]:
+						seen[j] = 1
+						queue[tail] = j
+						tail += 1
+			d += 1
+	finally:
+		free(seen)
+		free(queue)
+	return head
@@ -0,0 +1,97 @@
+#!/usr/bin/env python
+
+from vision import disk_offsets
+
+# numpy is optional, without it every candidate is resolved with plain python loops
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# the focus battle of the engine: an ant's weakness is the number of enemies
+# within attackradius2 of it, and it dies when any of those enemies is no
+# weaker than itself. evaluate() resolves a whole batch of candidate moves for
+# my ants against fixed enemy positions at once. With numpy every candidate
+# gets a flat occupancy grid, and the ants found at each attack disk offset are
+# gathered for all candidates, ants and offsets in one indexing pass.
+
+class Combat:
+    def __init__(self, rows, cols, attackradius2):
+        self.rows = rows
+        self.cols = cols
+        self.offsets = [offset for offset in disk_offsets(attackradius2) if offset != (0, 0)]
+        self.vectorized = numpy is not None
+        if self.vectorized:
+            self.d_rows = numpy.array([d_row for d_row, d_col in self.offsets])
+            self.d_cols = numpy.array([d_col for d_row, d_col in self.offsets])
+        # candidates resolved so far
+        self.evaluated = 0
+
+    def evaluate(self, mine, enemies, candidates):
+        '''(my losses, enemy losses) of each candidate. mine are my ant locations,
+        enemies (location, owner) pairs, and each candidate lists where the ants
+        of mine end up, in the same order. Ants are assumed not to share a square.'''
+        self.evaluated += len(candidates)
+        if not candidates:
+            return []
+        if not enemies:
+            return [(0, 0)] * len(candidates)
+        if self.vectorized:
+            return self.evaluate_numpy(mine, enemies, candidates)
+        # my ants are owner 0 as in Ants
+        owners = [0] * len(mine) + [owner for loc, owner in enemies]
+        enemy_locs = [loc for loc, owner in enemies]
+        results = []
+        for candidate in candidates:
+            dead = self.resolve(list(candidate) + enemy_locs, owners)
+            my_dead = sum(dead[:len(mine)])
+            results.append((my_dead, sum(dead) - my_dead))
+        return results
+
+    def resolve(self, locs, owners):
+        'which of the ants at locs die, a list of booleans'
+        rows, cols = self.rows, self.cols
+        offsets = self.offsets
+        owner_at = dict(zip(locs, owners))
+        in_range = []
+        for (row, col), owner in zip(locs, owners):
+            hostile = []
+            for d_row, d_col in offsets:
+                other = ((row + d_row) % rows, (col + d_col) % cols)
+                other_owner = owner_at.get(other)
+                if other_owner is not None and other_owner != owner:
+                    hostile.append(other)
+            in_range.append(hostile)
+        weakness = dict((loc, len(hostile)) for loc, hostile in zip(locs, in_range))
+        dead = []
+        for loc, hostile in zip(locs, in_range):
+            weak = weakness[loc]
+            dead.append(any(weakness[other] <= weak for other in hostile))
+        return dead
+
+    def evaluate_numpy(self, mine, enemies, candidates):
+        rows, cols = self.rows, self.cols
+        count = len(candidates)
+        enemy_locs = numpy.array([loc for loc, owner in enemies], dtype=numpy.int32).reshape(-1, 2)
+        moved = numpy.array(candidates, dtype=numpy.int32).reshape(count, len(mine), 2)
+        # (candidate, ant, row/col) with the enemies standing still in every candidate
+        locs = numpy.concatenate((moved, numpy.broadcast_to(enemy_locs, (count,) + enemy_locs.shape)), axis=1)
+        # 0 marks an empty square, so owners are stored one up
+        owners = numpy.array([1] * len(mine) + [owner + 1 for loc, owner in enemies], dtype=numpy.int16)
+        flat = locs[:, :, 0] * cols + locs[:, :, 1]
+        which = numpy.arange(count)[:, None]
+        occupied = numpy.zeros((count, rows * cols), dtype=numpy.int16)
+        occupied[which, flat] = owners
+        # every square in the attack disk of every ant, (candidate, ant, offset)
+        around = (((locs[:, :, 0, None] + self.d_rows) % rows) * cols
+                  + (locs[:, :, 1, None] + self.d_cols) % cols)
+        around_owner = occupied[which[:, :, None], around]
+        hostile = (around_owner != 0) & (around_owner != owners[:, None])
+        weakness = hostile.sum(axis=2).astype(numpy.int16)
+        weakest = numpy.full((count, rows * cols), len(self.offsets) + 1, dtype=numpy.int16)
+        weakest[which, flat] = weakness
+        around_weakness = numpy.where(hostile, weakest[which[:, :, None], around], len(self.offsets) + 1)
+        dead = around_weakness.min(axis=2) <= weakness
+        my_dead = dead[:, :len(mine)].sum(axis=1)
+        enemy_dead = dead[:, len(mine):].sum(axis=1)
+        return list(zip(my_dead.tolist(), enemy_dead.tolist()))
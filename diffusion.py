@@ -0,0 +1,205 @@
+#!/usr/bin/env python
+
+from collections import deque
+
+# numpy is optional, without it every spread falls back to a plain python search
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# a scent map: every source adds value + cost*d + inc*d*(d-1)/2 to the squares
+# d steps from it over the known land, out to the first distance where that is
+# no longer positive, the same spread as kernels.diffuse. A kind of source has
+# its (value, cost) in the types table, inc is 1 for a growing cost and -1 for
+# a shrinking one. What each source adds is kept, so a source coming or going
+# only costs its own spread, and water turning up only redoes the sources in
+# reach of it.
+
+class DiffusionMap:
+    def __init__(self, rows, cols, water, types, neighbors=None):
+        self.rows = rows
+        self.cols = cols
+        self.size = rows * cols
+        # shared with whoever learns the map, nonzero marks water, a bytearray
+        # so that numpy can read it in place
+        self.water = water
+        self.locs = [(row, col) for row in range(rows) for col in range(cols)]
+        # the n, e, s, w neighbor indexes of each cell, Ants.neighbor_index if given
+        if neighbors is None:
+            neighbors = []
+            for row in range(rows):
+                for col in range(cols):
+                    neighbors.append((((row - 1) % rows) * cols + col,
+                                      row * cols + (col + 1) % cols,
+                                      ((row + 1) % rows) * cols + col,
+                                      row * cols + (col - 1) % cols))
+        self.neighbors = neighbors
+        # kind -> the value at each distance, the last one positive
+        self.tables = {}
+        for kind, (value, cost) in types.items():
+            self.tables[kind] = spread_table(value, cost, self.size)
+        self.vectorized = numpy is not None
+        if self.vectorized:
+            self.grid = numpy.zeros(self.size, dtype=numpy.int32)
+            self.water_view = numpy.frombuffer(water, dtype=numpy.uint8)
+        else:
+            self.grid = [0] * self.size
+        # (kind, loc) -> (cells, values) the source added to grid
+        self.spreads = {}
+        self.computed = 0
+
+    def value(self, loc):
+        row, col = loc
+        return int(self.grid[row * self.cols + col])
+
+    def climb(self, loc):
+        'the neighbor of loc with the highest value above its own, None if there is none'
+        row, col = loc
+        i = row * self.cols + col
+        grid = self.grid
+        best = None
+        best_value = grid[i]
+        for j in self.neighbors[i]:
+            if grid[j] > best_value:
+                best = j
+                best_value = grid[j]
+        if best is None:
+            return None
+        return self.locs[best]
+
+    def update(self, sources):
+        '''bring the map to sources, a kind -> locations mapping. Sources no
+        longer given are taken off, new ones spread, the rest stay as they are.'''
+        wanted = set()
+        for kind, locs in sources.items():
+            for loc in locs:
+                wanted.add((kind, loc))
+        for key in [key for key in self.spreads if key not in wanted]:
+            self.take(key)
+        new = {}
+        for kind, loc in wanted:
+            if (kind, loc) not in self.spreads:
+                new.setdefault(kind, []).append(loc)
+        for kind, locs in new.items():
+            self.spread(kind, locs)
+
+    def invalidate(self, locs):
+        'water came or went at locs, the sources within reach of them are spread again on update'
+        rows, cols = self.rows, self.cols
+        for key in list(self.spreads):
+            kind, (s_row, s_col) = key
+            reach = len(self.tables[kind]) - 1
+            for row, col in locs:
+                d_row = abs(row - s_row)
+                d_col = abs(col - s_col)
+                if min(d_row, rows - d_row) + min(d_col, cols - d_col) <= reach:
+                    self.take(key)
+                    break
+
+    def take(self, key):
+        cells, values = self.spreads.pop(key)
+        if self.vectorized:
+            self.grid[cells] -= values
+        else:
+            grid = self.grid
+            for i, value in zip(cells, values):
+                grid[i] -= value
+
+    def spread(self, kind, locs):
+        table = self.tables[kind]
+        reach = len(table) - 1
+        if reach < 0:
+            # a kind that adds nothing anywhere
+            spreads = [([], []) for loc in locs]
+        elif self.vectorized and 2 * reach + 1 <= min(self.rows, self.cols):
+            spreads = self.spread_window(locs, table)
+        else:
+            spreads = [self.spread_search(loc, table) for loc in locs]
+        for loc, (cells, values) in zip(locs, spreads):
+            if self.vectorized:
+                cells = numpy.asarray(cells, dtype=numpy.intp)
+                values = numpy.asarray(values, dtype=numpy.int32)
+                self.grid[cells] += values
+            else:
+                grid = self.grid
+                for i, value in zip(cells, values):
+                    grid[i] += value
+            self.spreads[(kind, loc)] = (cells, values)
+            self.computed += 1
+
+    def spread_window(self, locs, table):
+        '''(cells, values) of every source in locs at once, a breadth first
+        relaxation on the square window around each source, which holds every
+        walk of up to reach steps'''
+        rows, cols = self.rows, self.cols
+        reach = len(table) - 1
+        width = 2 * reach + 1
+        offsets = numpy.arange(-reach, reach + 1)
+        sources = numpy.array(locs).reshape(-1, 2)
+        w_rows = (sources[:, 0:1] + offsets) % rows
+        w_cols = (sources[:, 1:2] + offsets) % cols
+        cells = w_rows[:, :, None] * cols + w_cols[:, None, :]
+        land = self.water_view[cells] == 0
+        count = len(locs)
+        dist = numpy.full((count, width, width), -1, dtype=numpy.int32)
+        dist[:, reach, reach] = 0
+        reached = dist == 0
+        front = reached.copy()
+        for d in range(1, reach + 1):
+            grown = numpy.zeros_like(front)
+            grown[:, 1:, :] |= front[:, :-1, :]
+            grown[:, :-1, :] |= front[:, 1:, :]
+            grown[:, :, 1:] |= front[:, :, :-1]
+            grown[:, :, :-1] |= front[:, :, 1:]
+            grown &= land
+            grown &= ~reached
+            if not grown.any():
+                break
+            dist[grown] = d
+            reached |= grown
+            front = grown
+        values = numpy.array(table, dtype=numpy.int32)
+        spreads = []
+        for k in range(count):
+            mask = reached[k]
+            spreads.append((cells[k][mask], values[dist[k][mask]]))
+        return spreads
+
+    def spread_search(self, loc, table):
+        '(cells, values) of one source by a plain breadth first search'
+        row, col = loc
+        source = row * self.cols + col
+        water = self.water
+        neighbors = self.neighbors
+        reach = len(table) - 1
+        dist = {source: 0}
+        frontier = deque([source])
+        cells = []
+        values = []
+        while frontier:
+            i = frontier.popleft()
+            d = dist[i]
+            cells.append(i)
+            values.append(table[d])
+            if d == reach:
+                continue
+            for j in neighbors[i]:
+                if j not in dist and not water[j]:
+                    dist[j] = d + 1
+                    frontier.append(j)
+        return cells, values
+
+
+def spread_table(value, cost, limit):
+    'the value at each distance up to the last positive one, limit distances at most'
+    inc = 1 if cost > 0 else -1
+    table = []
+    d = 0
+    while d <= limit:
+        v = value + cost * d + inc * d * (d - 1) // 2
+        if v <= 0:
+            break
+        table.append(v)
+        d += 1
+    return table
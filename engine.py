@@ -0,0 +1,501 @@
+#!/usr/bin/env python
+
+import os
+import sys
+import time
+import signal
+import random
+import threading
+import traceback
+import subprocess
+from collections import defaultdict
+
+try:
+    from StringIO import StringIO
+    from Queue import Queue, Empty
+except ImportError:
+    from io import StringIO
+    from queue import Queue, Empty
+
+from ants import Ants, AIM, RECORDS
+from vision import disk_offsets
+
+# a local stand-in for the tournament server. It speaks the same stdin/stdout
+# protocol as Ants.run, resolves turns with the usual rules (move, attack,
+# raze hills, spawn, gather food, spawn food) and can drive bots in-process
+# or as subprocesses.
+
+MAP_WATER = '%'
+MAP_FOOD = '*'
+MAP_LAND = '.'
+MAP_ANTS = 'abcdefghij'
+MAP_HILLS = '0123456789'
+MAP_ANTS_ON_HILL = 'ABCDEFGHIJ'
+
+def parse_map(text):
+    'parse a map in the rows/cols/players/m line format into a dict'
+    rows = cols = players = None
+    water = set()
+    food = set()
+    ants = {}
+    hills = {}
+    row = 0
+    for line in text.split('\n'):
+        line = line.strip()
+        if not line:
+            continue
+        key, _, value = line.partition(' ')
+        if key == 'rows':
+            rows = int(value)
+        elif key == 'cols':
+            cols = int(value)
+        elif key == 'players':
+            players = int(value)
+        elif key == 'm':
+            for col, c in enumerate(value):
+                if c == MAP_WATER:
+                    water.add((row, col))
+                elif c == MAP_FOOD:
+                    food.add((row, col))
+                elif c in MAP_ANTS:
+                    ants[(row, col)] = MAP_ANTS.index(c)
+                elif c in MAP_HILLS:
+                    hills[(row, col)] = MAP_HILLS.index(c)
+                elif c in MAP_ANTS_ON_HILL:
+                    ants[(row, col)] = MAP_ANTS_ON_HILL.index(c)
+                    hills[(row, col)] = MAP_ANTS_ON_HILL.index(c)
+            row += 1
+    if players is None:
+        players = max(list(hills.values()) + list(ants.values())) + 1
+    return {'rows': rows, 'cols': cols, 'players': players,
+            'water': water, 'food': food, 'ants': ants, 'hills': hills}
+
+def render_map(game_map):
+    'the inverse of parse_map'
+    rows = game_map['rows']
+    cols = game_map['cols']
+    grid = [[MAP_LAND] * cols for row in range(rows)]
+    for row, col in game_map['water']:
+        grid[row][col] = MAP_WATER
+    for row, col in game_map['food']:
+        grid[row][col] = MAP_FOOD
+    for (row, col), owner in game_map['hills'].items():
+        grid[row][col] = MAP_HILLS[owner]
+    for (row, col), owner in game_map['ants'].items():
+        if (row, col) in game_map['hills']:
+            grid[row][col] = MAP_ANTS_ON_HILL[owner]
+        else:
+            grid[row][col] = MAP_ANTS[owner]
+    lines = ['rows %s' % rows, 'cols %s' % cols, 'players %s' % game_map['players']]
+    lines.extend(['m %s' % ''.join(grid_row) for grid_row in grid])
+    return '\n'.join(lines) + '\n'
+
+
+class InProcessBot:
+    'drives a bot object by calling do_setup and do_turn directly'
+    def __init__(self, bot, name=None, flat=False):
+        self.bot = bot
+        self.name = name or bot.__class__.__module__
+        self.ants = Ants(flat)
+        # time_remaining() as the bot finished each turn
+        self.remaining = []
+        # exceptions the bot raised and the last line of the latest one
+        self.errors = 0
+        self.last_error = None
+
+    def capture(self, call):
+        # finish_turn writes the orders to stdout, read them back from there
+        stdout = sys.stdout
+        sys.stdout = StringIO()
+        try:
+            try:
+                call()
+            except KeyboardInterrupt:
+                raise
+            except:
+                # same as Ants.run, the bot stays alive and sends what it has
+                traceback.print_exc(file=sys.stderr)
+                self.errors += 1
+                self.last_error = traceback.format_exc().strip().split('\n')[-1]
+            self.ants.finish_turn()
+            return sys.stdout.getvalue()
+        finally:
+            sys.stdout = stdout
+
+    def start(self, text):
+        for line in text.split('\n'):
+            if line != 'ready':
+                self.ants.setup_line(line)
+        self.ants.finish_setup()
+        self.capture(lambda: self.bot.do_setup(self.ants))
+
+    def turn(self, text, turn=None):
+        'feed one turn and return the order lines'
+        ants = self.ants
+        ants.turn_start_time = time.time()
+        ants.begin_update()
+        for line in text.split('\n'):
+            if line[:2] in RECORDS:
+                ants.parse_line(line)
+        return self.capture(self.do_turn).split('\n')
+
+    def do_turn(self):
+        self.bot.do_turn(self.ants)
+        self.remaining.append(self.ants.time_remaining())
+
+    def end(self, text):
+        'show the final state to a bot with a do_end method, as Ants.run does'
+        do_end = getattr(self.bot, 'do_end', None)
+        if do_end is None:
+            return
+        ants = self.ants
+        ants.turn_start_time = time.time()
+        ants.begin_update()
+        for line in text.split('\n'):
+            if line[:2] in RECORDS:
+                ants.parse_line(line)
+        self.capture(lambda: do_end(ants))
+
+
+class SubprocessBot:
+    'drives a bot command over pipes, exactly as the server would'
+    def __init__(self, command, name=None):
+        self.command = command
+        self.name = name or command
+        self.timeout = 60
+        # the turn a bot ran past its timeout, the server drops it from then on
+        self.timed_out = None
+        # in a process group of its own, so dropping it stops the bot and not only the shell
+        self.process = subprocess.Popen(command, shell=True, stdin=subprocess.PIPE,
+                                        stdout=subprocess.PIPE, universal_newlines=True,
+                                        preexec_fn=getattr(os, 'setsid', None))
+        # a reader thread so a slow bot can be timed out without blocking the game
+        self.lines = Queue()
+        reader = threading.Thread(target=self.read_lines)
+        reader.daemon = True
+        reader.start()
+
+    def read_lines(self):
+        for line in iter(self.process.stdout.readline, ''):
+            self.lines.put(line.strip())
+        self.lines.put(None)
+
+    def send(self, text):
+        self.process.stdin.write(text)
+        self.process.stdin.flush()
+
+    def read_until_go(self, timeout):
+        'the lines up to go, None if the bot did not finish within timeout'
+        lines = []
+        deadline = time.time() + timeout
+        while True:
+            try:
+                line = self.lines.get(timeout=max(0, deadline - time.time()))
+            except Empty:
+                return None
+            if line is None or line == 'go':
+                return lines
+            lines.append(line)
+
+    def drop(self, turn):
+        'the bot timed out, its late orders would be read as the next reply, so it goes'
+        self.timed_out = turn
+        try:
+            if hasattr(os, 'killpg'):
+                os.killpg(self.process.pid, signal.SIGKILL)
+            else:
+                self.process.kill()
+        except OSError:
+            pass
+
+    def start(self, text):
+        self.send(text)
+        if self.read_until_go(60) is None:
+            self.drop(0)
+
+    def turn(self, text, turn=None):
+        if self.timed_out is not None:
+            return []
+        try:
+            self.send(text)
+        except (IOError, OSError):
+            # the bot has exited, it gives no more orders
+            return []
+        lines = self.read_until_go(self.timeout)
+        if lines is None:
+            self.drop(turn)
+            return []
+        return lines
+
+    def end(self, text):
+        if self.timed_out is not None:
+            self.process.wait()
+            return
+        try:
+            self.send(text)
+            self.process.stdin.close()
+        except (IOError, OSError):
+            pass
+        self.process.wait()
+
+
+class Game:
+    def __init__(self, game_map, turns=500, loadtime=3000, turntime=500,
+                 viewradius2=77, attackradius2=5, spawnradius2=1,
+                 food_rate=2, seed=0):
+        self.rows = game_map['rows']
+        self.cols = game_map['cols']
+        self.players = game_map['players']
+        self.water = set(game_map['water'])
+        self.food = set(game_map['food'])
+        self.ants = dict(game_map['ants'])
+        self.hills = dict(game_map['hills'])
+        self.turns = turns
+        self.loadtime = loadtime
+        self.turntime = turntime
+        self.viewradius2 = viewradius2
+        self.attackradius2 = attackradius2
+        self.spawnradius2 = spawnradius2
+        self.food_rate = food_rate
+        self.seed = seed
+        self.random = random.Random(seed)
+        self.view_offsets = disk_offsets(viewradius2)
+        self.attack_offsets = [offset for offset in disk_offsets(attackradius2) if offset != (0, 0)]
+        self.spawn_offsets = disk_offsets(spawnradius2)
+        self.turn = 0
+        self.dead = []
+        self.hive = [0] * self.players
+        # every player starts with one point per hill
+        self.score = [0] * self.players
+        for owner in self.hills.values():
+            self.score[owner] += 1
+        self.seen_water = [set() for player in range(self.players)]
+        self.land = [(row, col) for row in range(self.rows) for col in range(self.cols)
+                     if (row, col) not in self.water]
+        # one starting ant on every hill
+        for owner in self.hills.values():
+            self.hive[owner] += 1
+        self.spawn()
+
+    def destination(self, loc, direction):
+        row, col = loc
+        d_row, d_col = AIM[direction]
+        return ((row + d_row) % self.rows, (col + d_col) % self.cols)
+
+    def settings(self, player):
+        lines = ['turn 0',
+                 'loadtime %s' % self.loadtime,
+                 'turntime %s' % self.turntime,
+                 'rows %s' % self.rows,
+                 'cols %s' % self.cols,
+                 'turns %s' % self.turns,
+                 'viewradius2 %s' % self.viewradius2,
+                 'attackradius2 %s' % self.attackradius2,
+                 'spawnradius2 %s' % self.spawnradius2,
+                 'player_seed %s' % (self.seed * 10 + player),
+                 'ready']
+        return '\n'.join(lines) + '\n'
+
+    def visible(self, player):
+        'the set of squares visible to a player'
+        vision = set()
+        for (row, col), owner in self.ants.items():
+            if owner == player:
+                for d_row, d_col in self.view_offsets:
+                    vision.add(((row + d_row) % self.rows, (col + d_col) % self.cols))
+        return vision
+
+    def state(self, player):
+        'the map records for one player, owners numbered relative to the player'
+        players = self.players
+        vision = self.visible(player)
+        lines = []
+        seen_water = self.seen_water[player]
+        for loc in vision:
+            if loc in self.water and loc not in seen_water:
+                seen_water.add(loc)
+                lines.append('w %s %s' % loc)
+        for loc in self.food:
+            if loc in vision:
+                lines.append('f %s %s' % loc)
+        for loc, owner in self.hills.items():
+            if loc in vision:
+                lines.append('h %s %s %s' % (loc[0], loc[1], (owner - player) % players))
+        for loc, owner in self.ants.items():
+            if loc in vision:
+                lines.append('a %s %s %s' % (loc[0], loc[1], (owner - player) % players))
+        for loc, owner in self.dead:
+            if loc in vision:
+                lines.append('d %s %s %s' % (loc[0], loc[1], (owner - player) % players))
+        return lines
+
+    def parse_orders(self, player, lines):
+        'the valid moves of one player as {from: to}'
+        moves = {}
+        for line in lines:
+            tokens = line.split()
+            if len(tokens) != 4 or tokens[0] != 'o' or tokens[3] not in AIM:
+                continue
+            try:
+                loc = (int(tokens[1]), int(tokens[2]))
+            except ValueError:
+                continue
+            if self.ants.get(loc) != player or loc in moves:
+                continue
+            dest = self.destination(loc, tokens[3])
+            if dest in self.water:
+                continue
+            moves[loc] = dest
+        return moves
+
+    def move(self, moves):
+        'move every ant, ants ending on the same square all die'
+        arrivals = defaultdict(list)
+        for loc, owner in self.ants.items():
+            arrivals[moves.get(loc, loc)].append(owner)
+        self.ants = {}
+        for loc, owners in arrivals.items():
+            if len(owners) == 1:
+                self.ants[loc] = owners[0]
+            else:
+                for owner in owners:
+                    self.dead.append((loc, owner))
+
+    def enemies_in_range(self, loc, owner):
+        row, col = loc
+        enemies = []
+        for d_row, d_col in self.attack_offsets:
+            other = ((row + d_row) % self.rows, (col + d_col) % self.cols)
+            other_owner = self.ants.get(other)
+            if other_owner is not None and other_owner != owner:
+                enemies.append(other)
+        return enemies
+
+    def attack(self):
+        'focus battle: an ant dies if an enemy in range is no more distracted than itself'
+        enemies = {}
+        for loc, owner in self.ants.items():
+            enemies[loc] = self.enemies_in_range(loc, owner)
+        killed = []
+        for loc, in_range in enemies.items():
+            weakness = len(in_range)
+            for enemy in in_range:
+                if len(enemies[enemy]) <= weakness:
+                    killed.append(loc)
+                    break
+        for loc in killed:
+            self.dead.append((loc, self.ants.pop(loc)))
+
+    def raze(self):
+        for loc, owner in list(self.hills.items()):
+            razer = self.ants.get(loc)
+            if razer is not None and razer != owner:
+                del self.hills[loc]
+                self.score[owner] -= 1
+                self.score[razer] += 2
+
+    def spawn(self):
+        for loc, owner in self.hills.items():
+            if self.hive[owner] > 0 and loc not in self.ants:
+                self.ants[loc] = owner
+                self.hive[owner] -= 1
+
+    def gather(self):
+        'food next to ants of one player feeds that player, contested food is lost'
+        for loc in list(self.food):
+            row, col = loc
+            owners = set()
+            for d_row, d_col in self.spawn_offsets:
+                owner = self.ants.get(((row + d_row) % self.rows, (col + d_col) % self.cols))
+                if owner is not None:
+                    owners.add(owner)
+            if owners:
+                self.food.discard(loc)
+                if len(owners) == 1:
+                    self.hive[owners.pop()] += 1
+
+    def spawn_food(self):
+        for i in range(self.food_rate):
+            loc = self.random.choice(self.land)
+            if loc not in self.ants and loc not in self.hills:
+                self.food.add(loc)
+
+    def alive(self):
+        'players that still have ants or hills'
+        return set(self.ants.values()) | set(self.hills.values())
+
+    def game_over(self):
+        return self.turn >= self.turns or len(self.alive()) <= 1
+
+    def do_turn(self, orders):
+        'resolve one turn, orders is a list of order lines per player'
+        self.turn += 1
+        self.dead = []
+        moves = {}
+        for player, lines in enumerate(orders):
+            moves.update(self.parse_orders(player, lines))
+        self.move(moves)
+        self.attack()
+        self.raze()
+        self.spawn()
+        self.gather()
+        self.spawn_food()
+
+    def run(self, bots):
+        'play a whole game, returns per player scores and turn timings'
+        times = [[] for bot in bots]
+        for player, bot in enumerate(bots):
+            bot.timeout = self.turntime / 1000.0 + 1.0
+            bot.start(self.settings(player))
+        while not self.game_over():
+            orders = []
+            for player, bot in enumerate(bots):
+                if player not in self.alive():
+                    orders.append([])
+                    continue
+                text = 'turn %s\n%s\ngo\n' % (self.turn + 1, '\n'.join(self.state(player)))
+                start = time.time()
+                orders.append(bot.turn(text, self.turn + 1))
+                times[player].append((time.time() - start) * 1000)
+            self.do_turn(orders)
+        for player, bot in enumerate(bots):
+            text = 'end\nplayers %s\nscore %s\n%s\ngo\n' % (
+                self.players, ' '.join([str(score) for score in self.score]),
+                '\n'.join(self.state(player)))
+            bot.end(text)
+        return {'turns': self.turn,
+                'score': self.score[:],
+                'ants': [list(self.ants.values()).count(player) for player in range(self.players)],
+                'turn_ms': times,
+                'timeouts': [len([t for t in player_times if t > self.turntime])
+                             for player_times in times],
+                # the turn each bot was dropped on for running past its timeout
+                'timed_out': [getattr(bot, 'timed_out', None) for bot in bots],
+                # exceptions raised by in-process bots, None for subprocesses
+                'errors': [getattr(bot, 'errors', None) for bot in bots]}
+
+
+def load_bot(spec):
+    'module:Class or module (using MyBot) for in-process bots, anything else is a command'
+    if ' ' in spec or spec.endswith('.py'):
+        return SubprocessBot(spec)
+    module_name, _, class_name = spec.partition(':')
+    module = __import__(module_name)
+    return InProcessBot(getattr(module, class_name or 'MyBot')(), module_name)
+
+if __name__ == '__main__':
+    import argparse
+    import json
+    parser = argparse.ArgumentParser(description='play a local game between bots')
+    parser.add_argument('map', help='map file')
+    parser.add_argument('bots', nargs='+',
+                        help='module[:Class] to run in-process, or a shell command')
+    parser.add_argument('--turns', type=int, default=500)
+    parser.add_argument('--turntime', type=int, default=500)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    game_map = parse_map(open(args.map).read())
+    game = Game(game_map, turns=args.turns, turntime=args.turntime, seed=args.seed)
+    result = game.run([load_bot(spec) for spec in args.bots])
+    del result['turn_ms']
+    print(json.dumps(result))
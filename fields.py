@@ -0,0 +1,72 @@
+#!/usr/bin/env python
+
+import kernels
+
+# a field holds, for every cell, the BFS distance to the nearest of a set of
+# sources over the known map, so any ant can read its nearest target and the
+# next step towards it without a search of its own.
+
+class DistanceField:
+    def __init__(self, rows, cols, water, neighbors):
+        self.rows = rows
+        self.cols = cols
+        self.size = rows * cols
+        # shared with whoever learns the map, nonzero marks water
+        self.water = water
+        self.neighbors = neighbors
+        self.locs = [(row, col) for row in range(rows) for col in range(cols)]
+        self.dist = [-1] * self.size
+        self.nearest = [-1] * self.size
+        self.sources = frozenset()
+        self.water_version = None
+        self.computed = 0
+
+    def update(self, sources, water_version):
+        'recompute only when the sources or the known water changed'
+        sources = frozenset(sources)
+        if sources == self.sources and water_version == self.water_version:
+            return False
+        self.compute(sources)
+        self.water_version = water_version
+        return True
+
+    def compute(self, sources):
+        'multi-source breadth first search from every source at once'
+        cols = self.cols
+        self.dist, self.nearest = kernels.bfs(self.rows, cols, self.water,
+                                              [row * cols + col for row, col in sources])
+        self.sources = sources
+        self.computed += 1
+
+    def adopt(self, sources, water_version, dist, nearest):
+        'take a field computed elsewhere, by worker.FieldWorker, as if update had computed it'
+        self.dist = dist
+        self.nearest = nearest
+        self.sources = frozenset(sources)
+        self.water_version = water_version
+
+    def distance(self, loc):
+        'steps to the nearest source, -1 if none is reachable'
+        row, col = loc
+        return self.dist[row * self.cols + col]
+
+    def target(self, loc):
+        'the nearest source, None if none is reachable'
+        row, col = loc
+        source = self.nearest[row * self.cols + col]
+        if source < 0:
+            return None
+        return self.locs[source]
+
+    def next_step(self, loc):
+        'a neighbor one step closer to the nearest source, loc itself when on a source'
+        row, col = loc
+        i = row * self.cols + col
+        dist = self.dist
+        d = dist[i]
+        if d <= 0:
+            return loc
+        for j in self.neighbors[i]:
+            if dist[j] == d - 1:
+                return self.locs[j]
+        return loc
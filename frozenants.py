@@ -3,6 +3,10 @@
 import random
 from random import randint
 import csv
+from pathcache import PathCache
+from assign import Assigner
+from seen import SeenMap
+from diffusion import DiffusionMap
 from collections import namedtuple, deque
 from math import sqrt
 
@@ -42,24 +46,31 @@ BEHIND = {'n': 's',
         's': 'n',
         'e': 'w',
         'w': 'e'}
+PATH_CACHE_ENTRIES = 100000
+# one explore target per block of this many squares a side along the frontier
+EXPLORE_SPACING = 10
 TYPE = {'food': (130, -5),
         'fog' : (20, -2),
         'hill': (150, -5)}
 
 def get_adjacent(ants, loc):
-    return [ants.destination(loc, dir) for dir in ('n', 'e', 's', 'w')]
+    return ants.neighbors(loc)
 
 def get_adjacent2(ants, loc):
     return [ants.destination(ants.destination(loc, dir), dir) for dir in ('n', 'e', 's', 'w')]
 
-straight_paths = {}
+# (location, dest) -> whether the straight walk between them is passable
+straight_paths = PathCache(20000)
 def straight_path(ants, start_loc, dest):
     loc = start_loc
     path = []
+    # the squares of cached walks jumped through, new entries lean on them too
+    hops = set()
     while (loc != dest and ants.time_remaining() > 50):
         path.append(loc)
         if (loc, dest) in straight_paths:
             is_passable = straight_paths[(loc, dest)]
+            hops.update(straight_paths.cells((loc, dest)))
             loc = dest
         else:
             directions = ants.direction(loc, dest)
@@ -70,9 +81,11 @@ def straight_path(ants, start_loc, dest):
                     loc = next_loc
                     is_passable = True
                     break
+        entries = []
         for step in path:
-            straight_paths[(step, loc)] = is_passable
-            straight_paths[(loc, step)] = is_passable
+            entries.append(((step, loc), is_passable))
+            entries.append(((loc, step), is_passable))
+        straight_paths.add_path(hops.union(path + [loc]), entries)
         if not is_passable: 
             return False
     return True
@@ -89,20 +102,20 @@ class MyBot:
     def do_setup(self, ants):
         # initialize data structures after learning the game settings
         self.hills = []
-        self.unseen = []
+        # the squares seen so far, explore targets are spread along its frontier
+        self.seen = SeenMap(ants.rows, ants.cols, ants.neighbor_index, EXPLORE_SPACING)
         self.explore_locs = set(ants.my_hills())
-        self.explored = set([])
         self.impassable = set([])
-        self.MDPs = []
-        self.stored_MDPs = {}
-        self.stored_paths = {}
-        self.path_dists = {}
+        # the scent of food, hills and the unexplored edge over the water seen so far
+        self.scents = DiffusionMap(ants.rows, ants.cols, self.seen.water, TYPE, ants.neighbor_index)
+        self.stored_paths = PathCache(PATH_CACHE_ENTRIES)
+        self.path_dists = PathCache(PATH_CACHE_ENTRIES)
+        self.assigner = Assigner(ants.rows, ants.cols)
         self.food_locs = []
         self.bookkeeping = []
         self.rallypoint = False
-        for row in range(0, ants.rows):
-            for col in range(0, ants.cols):
-                self.unseen.append((row, col))
+        if ants.vision_offsets_2 is None:
+            ants.build_vision_offsets()
 
     def do_turn(self, ants):
         # loop through all my ants and try to give them orders
@@ -180,15 +193,16 @@ class MyBot:
                 # pop off node with the lowest h value for next iteration
                 h, f, loc, par = frontier.pop(0)
             # prev is the previous location's parent
+            # the offset is 0 when the joined path's length has been evicted
             if (loc, dest) in self.stored_paths:
-                path_dist_offset = self.path_dists[(loc, dest)] 
+                path_dist_offset = self.path_dists.get((loc, dest), 0)
             else:
                 path_dist_offset = 0
             final_path = []
             # loop retraces back to start_loc, ends when it finds the node with no parent
             while par != None:
                 # if part of the path is unknown, it could potentially be a bad path
-                if loc in self.unseen:
+                if not self.seen.is_seen(loc):
                     memoization = False
                 final_path.insert(0, loc)
                 next_par, loc = par
@@ -196,12 +210,15 @@ class MyBot:
             if memoization:
                 step = start_loc
                 dist = len(final_path) + path_dist_offset
+                dists = []
+                steps = []
                 for next_step in final_path:
-                    self.path_dists[(step, dest)] = dist
-                    self.path_dists[(step, dest)] = dist
+                    dists.append(((step, dest), dist))
                     dist -= 1
-                    self.stored_paths[(step, dest)] = next_step
+                    steps.append(((step, dest), next_step))
                     step = next_step
+                self.path_dists.add_path([start_loc] + final_path, dists)
+                self.stored_paths.add_path([start_loc] + final_path, steps)
             if (start_loc, dest) in self.stored_paths:
                 return self.stored_paths[(start_loc, dest)]
             else:
@@ -213,63 +230,22 @@ class MyBot:
             else:
                 return ants.distance(start_loc, dest)
 
-        def MDP(loc, type):
-            if (loc, type) in self.stored_MDPs:
-                local_MDP = self.stored_MDPs[(loc, type)]
-            else:
-                Q, cost = TYPE[type]
-                cost += randint(-2, 2)
-                if cost > 0:
-                    cost_increment = 1
-                else:
-                    cost_increment = -1
-                directions = ('n', 'e', 's', 'w')
-                frontier = [(loc, Q, cost)]
-                visited = []
-                local_MDP = []
-                while(True):
-                    if ants.time_remaining() < 50:
-                        return
-                    if len(frontier) == 0: 
-                        break
-                    locp, Q, cost = frontier.pop(0)
-                    if Q == 0:
-                        break
-                    local_MDP.append((locp, Q))
-                    for direction in directions:
-                        dest = ants.destination(locp, direction)
-                        if dest not in visited and dest not in [l for l, q, c in frontier] and ants.passable(dest):
-                            frontier.append((dest, Q + cost, cost + cost_increment))
-                    visited.append(locp)
-                self.stored_MDPs[(loc, type)] = local_MDP[:]
-            for loc, Q in local_MDP:
-                row, col = loc
-                self.MDPs[row][col] += Q
-            return
-
         # end function definitions
-        self.MDPs = [[0] * ants.cols for row in range(ants.rows)]
         available_ants = ants.my_ants()
-        indexes = []
-        for i, unseen_loc in enumerate(self.unseen):
-            if ants.visible(unseen_loc):
-                indexes.insert(0, i)
-                if unseen_loc in self.explore_locs:
-                    self.explore_locs.remove(unseen_loc)
-                    row, col = unseen_loc
-                    expanded_locs = ((row, (col + 10)), 
-                            (row, (col - 10)), 
-                            ((row + 10), col),
-                            ((row - 10), col))
-                    for expanded in expanded_locs: 
-                        if 0 <= expanded[0] and expanded[0] < ants.rows and 0 <= expanded[1] and expanded[1] < ants.cols:
-                            if expanded not in self.explored and expanded in self.unseen:
-                                self.explore_locs.add(expanded)
-                                self.explored.add(expanded)
-                if not ants.passable(unseen_loc):
-                    self.impassable.add(unseen_loc)
-        for i in indexes:
-            self.unseen.pop(i)
+        # only the squares seen for the first time are looked at
+        if self.seen.unseen_count:
+            in_view = [(a_row + v_row, a_col + v_col) for a_row, a_col in available_ants
+                       for v_row, v_col in ants.vision_offsets_2]
+            new_water = []
+            for new_loc in self.seen.mark(in_view, ants.passable):
+                if not ants.passable(new_loc):
+                    self.impassable.add(new_loc)
+                    self.stored_paths.invalidate(new_loc)
+                    self.path_dists.invalidate(new_loc)
+                    straight_paths.invalidate(new_loc)
+                    new_water.append(new_loc)
+            self.scents.invalidate(new_water)
+            self.explore_locs = set(self.seen.targets())
 
         # Prevent stepping on own hill
         for hill_loc in ants.my_hills():
@@ -327,13 +303,8 @@ class MyBot:
         # find close food
         food_counter = 10 - len(ants.my_ants())//8
         if food_counter > 0:
-            dists = []
-            for food_loc in self.food_locs:
-                if food_loc not in food_targets:
-                    for ant_loc in available_ants: 
-                        dist = fdistance(ant_loc, food_loc)
-                        dists.append((dist, ant_loc, food_loc))
-            dists.sort()
+            food_locs = [food_loc for food_loc in self.food_locs if food_loc not in food_targets]
+            dists = self.assigner.solve(available_ants, food_locs, fdistance)
             for dist, ant_loc, food_loc in dists:
                 if len(food_targets) > food_counter:
                     break
@@ -348,12 +319,7 @@ class MyBot:
 
         # attack hills
         if ants.time_remaining() > 140:
-            dists = []
-            for hill_loc in self.hills:
-                for ant_loc in available_ants:
-                    dist = fdistance(ant_loc, hill_loc)
-                    dists.append((dist, ant_loc, hill_loc))
-            dists.sort()
+            dists = self.assigner.solve(available_ants, self.hills, fdistance, capacity=None)
             for dist, ant_loc, hill_loc in dists:
                 if ant_loc not in available_ants:
                     continue
@@ -372,12 +338,7 @@ class MyBot:
 
         # explore the map
         if ants.time_remaining() > 80:
-            dists = []
-            for explore_loc in self.explore_locs:
-                for ant_loc in available_ants:
-                    dist = fdistance(ant_loc, explore_loc)
-                    dists.append((dist, ant_loc, explore_loc))
-            dists.sort()
+            dists = self.assigner.solve(available_ants, self.explore_locs, fdistance)
             for dist, ant_loc, explore_loc in dists:
                 if ant_loc not in available_ants:
                     continue
@@ -389,8 +350,14 @@ class MyBot:
                     dest = find_path(ant_loc, explore_loc)
                     do_move_location(ant_loc, dest)
 
-        for ant_loc in available_ants:
-            do_move_location(ant_loc, (randint(0, ants.rows), randint(0, ants.cols)))
+        # the rest follow the scent, or wander where there is none
+        if ants.time_remaining() > 50:
+            self.scents.update({'food': self.food_locs, 'hill': self.hills, 'fog': self.explore_locs})
+        for ant_loc in list(available_ants):
+            step = self.scents.climb(ant_loc)
+            if step is None:
+                step = (randint(0, ants.rows), randint(0, ants.cols))
+            do_move_location(ant_loc, step)
 
         # Unblock own hill
         for hill_loc in ants.my_hills():
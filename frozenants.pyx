@@ -1,8 +1,13 @@
 #!/usr/bin/env python
 
+import sys
 import random
 from random import randint
 import csv
+from pathcache import PathCache
+from assign import Assigner
+from seen import SeenMap
+from diffusion import DiffusionMap
 
 cdef extern from "math.h":
 	double sqrt(double n)
@@ -38,6 +43,8 @@ BEHIND = {'n': 's',
 		's': 'n',
 		'e': 'w',
 		'w': 'e'}
+# one explore target per block of this many squares a side, every frontier square
+EXPLORE_SPACING = 1
 TYPE = {'food': (130, -5),
 		'fog' : (20, -2),
 		'hill': (150, -5)}
@@ -95,21 +102,8 @@ def get_all_visible(ants):
 	cdef int a_row, a_col
 	visible = []
 	if ants.vision == None:
-		if not hasattr(ants, 'vision_offsets_2'):
-			# precalculate squares around an ant to set as visible
-			ants.vision_offsets_2 = []
-			mx = int(sqrt(ants.viewradius2))
-			for d_row in range(-mx,mx+1):
-				for d_col in range(-mx,mx+1):
-					d = d_row**2 + d_col**2
-					if d <= ants.viewradius2:
-						ants.vision_offsets_2.append((
-							# Create all negative offsets so vision will
-							# wrap around the edges properly
-							(d_row % ants.rows) - ants.rows,
-							(d_col % ants.cols) - ants.cols
-							))
-						# set all spaces as not visible
+		if ants.vision_offsets_2 is None:
+			ants.build_vision_offsets()
 	# loop through ants and set all squares around ant as visible
 	for ant in ants.my_ants():
 		a_row, a_col = ant
@@ -123,21 +117,8 @@ def fvisible(ants, loc):
 	cdef int a_row, a_col, row, col
 	visible = []
 	if ants.vision == None:
-		if not hasattr(ants, 'vision_offsets_2'):
-			# precalculate squares around an ant to set as visible
-			ants.vision_offsets_2 = []
-			mx = int(sqrt(ants.viewradius2))
-			for d_row in range(-mx,mx+1):
-				for d_col in range(-mx,mx+1):
-					d = d_row**2 + d_col**2
-					if d <= ants.viewradius2:
-						ants.vision_offsets_2.append((
-							# Create all negative offsets so vision will
-							# wrap around the edges properly
-							(d_row % ants.rows) - ants.rows,
-							(d_col % ants.cols) - ants.cols
-							))
-						# set all spaces as not visible
+		if ants.vision_offsets_2 is None:
+			ants.build_vision_offsets()
 		# loop through ants and set all squares around ant as visible
 		ants.vision = [[False]*ants.cols for row in range(ants.rows)]
 		for ant in ants.my_ants():
@@ -147,14 +128,18 @@ def fvisible(ants, loc):
 	row, col = loc
 	return ants.vision[row][col]
 
-straight_paths = {}
+# (location, dest) -> whether the straight walk between them is passable
+straight_paths = PathCache(20000)
 def straight_path(ants, start_loc, dest):
 	loc = start_loc
 	path = []
+	# the squares of cached walks jumped through, new entries lean on them too
+	hops = set()
 	while (loc != dest and ants.time_remaining() > 50):
 		path.append(loc)
 		if (loc, dest) in straight_paths:
 			is_passable = straight_paths[(loc, dest)]
+			hops.update(straight_paths.cells((loc, dest)))
 			loc = dest
 		else:
 			directions = fdirection(ants, loc, dest)
@@ -165,9 +150,11 @@ def straight_path(ants, start_loc, dest):
 					loc = next_loc
 					is_passable = True
 					break
+		entries = []
 		for step in path:
-			straight_paths[(step, loc)] = is_passable
-			straight_paths[(loc, step)] = is_passable
+			entries.append(((step, loc), is_passable))
+			entries.append(((loc, step), is_passable))
+		straight_paths.add_path(hops.union(path + [loc]), entries)
 		if not is_passable: 
 			return False
 	return True
@@ -183,17 +170,16 @@ class MyBot:
 	# the ants class is created and setup by the Ants.run method
 	def do_setup(self, ants):
 		# initialize data structures after learning the game settings
-		self.logs = csv.writer(open('log_frozenants.csv', 'wb'))
+		# csv wants a binary file on python 2 and a text file on python 3
+		self.logs = csv.writer(open('log_frozenants.csv', 'wb' if sys.version_info[0] < 3 else 'w'))
 		self.hills = []
 		self.waypoints = []
-		self.unseen = []
+		# the squares seen so far and the seen land next to unseen squares
+		self.seen = SeenMap(ants.rows, ants.cols, ants.neighbor_index, EXPLORE_SPACING)
 		self.visible = []
-		self.visible_frontier = []
-		self.MDPs = []
-		self.stored_MDPs = {}
-		for row in range(0, ants.rows):
-			for col in range(0, ants.cols):
-				self.unseen.append((row, col))
+		# the scent of food, hills and the unexplored edge over the water seen so far
+		self.scents = DiffusionMap(ants.rows, ants.cols, self.seen.water, TYPE, ants.neighbor_index)
+		self.assigner = Assigner(ants.rows, ants.cols)
 		for row in range(0, ants.rows, 3):
 			for col in range(0, ants.cols, 3):
 				self.waypoints.append((row, col))
@@ -229,49 +215,8 @@ class MyBot:
 			return False
 
 		def get_adjacent(loc):
-			directions = ('n', 'e', 's', 'w')
-			adjacent = []
-			for direction in directions:
-				adjacent.append(ants.destination(loc, direction))
-			return adjacent
-
-		def MDP(loc, type):
-			cdef int Q, cost, cost_increment
-			cdef int row, col
-			if (loc, type) in self.stored_MDPs:
-				local_MDP = self.stored_MDPs[(loc, type)]
-			else:
-				Q, cost = TYPE[type]
-				cost += randint(-2, 2)
-				if cost > 0:
-					cost_increment = 1
-				else:
-					cost_increment = -1
-				directions = ('n', 'e', 's', 'w')
-				frontier = [(loc, Q, cost)]
-				visited = []
-				local_MDP = []
-				while(True):
-					if ants.time_remaining() < 50:
-						return
-					if len(frontier) == 0: 
-						break
-					locp, Q, cost = frontier.pop(0)
-					if Q == 0:
-						break
-					local_MDP.append((locp, Q))
-					for direction in directions:
-						dest = ants.destination(locp, direction)
-						if dest not in visited and dest not in [l for l, q, c in frontier] and ants.passable(dest):
-							frontier.append((dest, Q + cost, cost + cost_increment))
-					visited.append(locp)
-				self.stored_MDPs[(loc, type)] = local_MDP[:]
-			for loc, Q in local_MDP:
-				row, col = loc
-				self.MDPs[row][col] += Q
-			return
+			return ants.neighbors(loc)
 
-		self.MDPs = [[0] * ants.cols for row in range(ants.rows)]
 		available_ants = ants.my_ants()
 
 		self.logs.writerow([(20, 20), fvisible(ants, (20, 20)), ants.visible((20, 20)), ants.passable((20, 20)), ants.unoccupied((20, 20))])
@@ -282,40 +227,35 @@ class MyBot:
 				orders[hill_loc] = None
 
 		# find close food
-		dists = []
-		for ant_loc in available_ants: 
-			for food_loc in ants.food():
-				dist = fdistance(ants, ant_loc, food_loc)
-				dists.append((dist, ant_loc, food_loc))
-		dists.sort()
+		dists = self.assigner.solve(available_ants, ants.food(), lambda ant_loc, food_loc: fdistance(ants, ant_loc, food_loc))
 		for dist, ant_loc, food_loc in dists:
 			if straight_path(ants, ant_loc, food_loc):
 				do_move_location(ant_loc, food_loc)
 
 		# explore unseen areas
-		if len(self.unseen) > 0:
+		if self.seen.unseen_count > 0:
 			self.visible = get_all_visible(ants)
-			for vis_loc in self.visible:
-				if vis_loc in self.unseen:
-					self.unseen.remove(vis_loc)
-					if vis_loc in self.visible_frontier:
-						self.visible_frontier.remove(vis_loc)
-					for adj in get_adjacent(vis_loc):
-						if adj in self.unseen and adj not in self.visible_frontier:
-							self.visible_frontier.append(adj)
-			dists = []
-			for ant_loc in available_ants: 
-				for frontier_loc in self.visible_frontier:
-					dist = fdistance(ants, ant_loc, frontier_loc)
-					dists.append((dist, ant_loc, frontier_loc))
-			dists.sort()
+			new_locs = self.seen.mark(self.visible, ants.passable)
+			new_water = [loc for loc in new_locs if not ants.passable(loc)]
+			for water_loc in new_water:
+				straight_paths.invalidate(water_loc)
+			self.scents.invalidate(new_water)
+			dists = self.assigner.solve(available_ants, self.seen.targets(), lambda ant_loc, frontier_loc: fdistance(ants, ant_loc, frontier_loc))
 			for dist, ant_loc, frontier_loc in dists:
 				if ants.time_remaining() < 50:
 					break
 				if straight_path(ants, ant_loc, frontier_loc):
 					do_move_location(ant_loc, frontier_loc)
 
-		for ant_loc in available_ants:
+		# the rest follow the scent, or take a random step where there is none
+		if ants.time_remaining() > 50:
+			self.scents.update({'food': ants.food(),
+								'hill': [loc for loc, owner in ants.enemy_hills()],
+								'fog': self.seen.targets()})
+		for ant_loc in list(available_ants):
+			step = self.scents.climb(ant_loc)
+			if step is not None and do_move_location(ant_loc, step):
+				continue
 			if do_move_direction(ant_loc, ('n', 'e', 's', 'w')[randint(0, 3)]):
 				break
 
@@ -1,21 +1,29 @@
 #!/usr/bin/env python
 
+import sys
 from ants import *
+from astar import AStar
+from jps import JumpPoint
+from vision import Vision
+from fields import DistanceField
+from assign import Assigner
+from spatial import SpatialIndex
+from combat import Combat
+from precompute import Precompute
+from snapshot import SnapshotStore
+from worker import FieldWorker
+from seen import SeenMap
+from diffusion import DiffusionMap
+import kernels
+from instrument import Profiler
+from budget import Budget
+from hpa import ClusterMap
 import random
-from random import randint
-import csv
-from collections import namedtuple, deque, defaultdict
+from pathcache import PathCache
 from math import sqrt
-from bisect import insort
-
-path_node = namedtuple('loc_node', ['parent', 'location'])
-frontier_node = namedtuple('frontier_node', ['h_val', 'f_val', 'location', 'parent'])
-stored_MDP = namedtuple('stored_MDP', ['frontier_lst', 'visited_set', 'cost_val'])
 
 random.seed()
 
-logs = csv.writer(open('log_frozenants.csv', 'wb'))
-
 AIM = {'n': (-1, 0),
         'e': (0, 1),
         's': (1, 0),
@@ -32,6 +40,17 @@ BEHIND = {'n': 's',
         's': 'n',
         'e': 'w',
         'w': 'e'}
+PATH_CACHE_ENTRIES = 100000
+# suspended searches kept for the next turn
+MAX_SEARCHES = 200
+# targets further than this are routed over the cluster map instead of by A*
+HPA_DISTANCE = 20
+# nearest hills or explore targets an idle ant tries in the fallback
+FALLBACK_TARGETS = 8
+# move sets scored per turn before ants close in on an enemy hill
+COMBAT_CANDIDATES = 32
+# one explore target per block of this many squares a side along the frontier
+EXPLORE_SPACING = 4
 TYPE = {'food': (130, -5),
         'fog' : (20, -2),
         'hill': (150, -5)}
@@ -40,14 +59,18 @@ TYPE = {'food': (130, -5),
 def get_adjacent2(ants, loc):
     return [ants.destination(ants.destination(loc, dir), dir) for dir in ('n', 'e', 's', 'w')]
 
-straight_paths = {}
+# (location, dest) -> whether the straight walk between them is passable
+straight_paths = PathCache(20000)
 def straight_path(ants, start_loc, dest):
     loc = start_loc
     path = []
+    # the squares of cached walks jumped through, new entries lean on them too
+    hops = set()
     while (loc != dest and ants.time_remaining() > 50):
         path.append(loc)
         if (loc, dest) in straight_paths:
             is_passable = straight_paths[(loc, dest)]
+            hops.update(straight_paths.cells((loc, dest)))
             loc = dest
         else:
             directions = ants.direction(loc, dest)
@@ -58,18 +81,33 @@ def straight_path(ants, start_loc, dest):
                     loc = next_loc
                     is_passable = True
                     break
+        entries = []
         for step in path:
-            straight_paths[(step, loc)] = is_passable
-            straight_paths[(loc, step)] = is_passable
+            entries.append(((step, loc), is_passable))
+            entries.append(((loc, step), is_passable))
+        straight_paths.add_path(hops.union(path + [loc]), entries)
         if not is_passable: 
             return False
     return True
 
 
 class MyBot:
-    def __init__(self):
+    def __init__(self, target_mode='paths', search_mode='astar', profile='profile_frozenants10.jsonl',
+                 snapshots='snapshots', worker=False):
         # define class level variables, will be remembered between turns
-        pass
+        # target_mode 'paths' pairs ants with targets and runs find_path per pair,
+        # 'fields' reads nearest targets off one distance field per target kind
+        self.target_mode = target_mode
+        # search_mode 'astar' or 'jps' picks the search behind find_path
+        self.search_mode = search_mode
+        # per turn phase and call timings go to the profile file, None turns them off
+        self.profiler = Profiler(profile, enabled=profile is not None)
+        # the directory the map knowledge of each game is kept in for the next
+        # game on the same map, None neither loads nor saves
+        self.snapshots = snapshots
+        # worker computes the distance fields of the next turn in a helper
+        # process while the bot waits on the engine
+        self.use_worker = worker
 
     # do_setup is run once at the start of the game
     # after the bot has received the game settings
@@ -77,38 +115,122 @@ class MyBot:
     def do_setup(self, ants):
         # initialize data structures after learning the game settings
         self.area = ants.cols * ants.rows
-        self.translator = [[(row, col) for col in range(ants.cols)] for row in range(ants.rows)]
-
         self.hills = set() 
-        self.unseen = set() 
         self.impassable = set()
 
-        self.MDPs = []
-        self.stored_MDPs = {} 
-        self.global_gradient = defaultdict(int)
-        self.hill_MDP_frontier = [] 
-
-        self.stored_paths = {}
-        self.path_dists = {}
+        # (location, dest) -> next step, and (location, dest) -> path length
+        self.stored_paths = PathCache(PATH_CACHE_ENTRIES)
+        self.path_dists = PathCache(PATH_CACHE_ENTRIES)
+        # (ant location, dest) -> astar.Search that ran out of time on an earlier turn
+        self.searches = {}
+        self.budget = Budget(ants.turntime)
+        # bumped whenever new water is learned, distance fields recompute on change
+        self.water_version = 0
 
         self.food_locs = []
         self.explore_locs = set()
         self.bookkeeping = []
 
-        for row in range(0, ants.rows):
-            for col in range(0, ants.cols):
-                self.unseen.add((row, col))
+        # the snapshot of an earlier game on this map is looked up on the first
+        # turn, once what is in view gives the fingerprint. Its water stays a
+        # hint until seen and its hills are only places to go and look.
+        self.snapshot_store = None
+        if self.snapshots is not None:
+            self.snapshot_store = SnapshotStore(self.snapshots, ants.rows, ants.cols)
+        self.fingerprint = None
+        self.snapshot = None
+        self.water_hints = set()
+        self.hill_hints = set()
+        # every enemy hill seen this game, razed or not
+        self.seen_hills = set()
+
+        # the static tables are built in timed steps, whatever is optional and
+        # does not fit in the loadtime is finished on idle time during the turns
+        rows = ants.rows
+        cols = ants.cols
+        precompute = self.precompute = Precompute()
+
+        def locations(time_remaining):
+            # one tuple per square, shared by every table built from them
+            self.translator = [[(row, col) for col in range(cols)] for row in range(rows)]
+            self.locs = [loc for row_locs in self.translator for loc in row_locs]
+        precompute.add('locations', locations)
+
+        def search_tables(time_remaining):
+            if self.search_mode == 'jps':
+                self.astar = JumpPoint(rows, cols, neighbors=ants.neighbor_index)
+            else:
+                self.astar = AStar(rows, cols, neighbors=ants.neighbor_index)
+            kernels.prepare(rows, cols, ants.neighbor_index)
+            # the squares seen so far and the seen land next to unseen squares
+            self.seen = SeenMap(rows, cols, ants.neighbor_index, EXPLORE_SPACING)
+            self.clusters = ClusterMap(rows, cols, self.astar.water, ants.neighbor_index)
+        precompute.add('search_tables', search_tables)
+
+        def offsets(time_remaining):
+            ants.build_vision_offsets()
+            self.vision = Vision(rows, cols, ants.viewradius2)
+            self.combat = Combat(rows, cols, ants.attackradius2)
+            # an enemy one step from the attack radius of a square could reach it
+            self.danger_radius2 = int((sqrt(ants.attackradius2) + 1) ** 2)
+            # the manhattan reach of the view circle
+            self.view_reach = int(sqrt(2 * ants.viewradius2))
+        precompute.add('offsets', offsets)
+
+        def indexes(time_remaining):
+            self.assigner = Assigner(rows, cols)
+            # the remembered enemy hills, rebuilt every turn
+            self.hill_index = SpatialIndex(rows, cols, ants.viewradius2)
+            for kind in ('mine', 'enemy', 'food', 'hill'):
+                ants.spatial(kind)
+            self.fields = {}
+            for kind in ('food', 'hill', 'explore'):
+                self.fields[kind] = DistanceField(rows, cols, self.astar.water, ants.neighbor_index)
+            # the scent of food, hills and the unexplored edge, TYPE weighs each kind
+            self.scents = DiffusionMap(rows, cols, self.astar.water, TYPE, ants.neighbor_index)
+        precompute.add('indexes', indexes)
+
+        self.worker = None
+        # the kinds whose field came from the helper and still holds this turn
+        self.fresh_kinds = []
+        def helper(time_remaining):
+            if not self.use_worker:
+                return
+            try:
+                self.worker = FieldWorker(rows, cols, ('food', 'hill', 'explore'))
+            except (IOError, OSError, ImportError):
+                # no processes or shared memory here, the fields stay in the turn
+                self.worker = None
+        precompute.add('worker', helper)
+
+        def cluster_graph(time_remaining):
+            # find_path refreshes what is left a cluster at a time anyway
+            self.clusters.refresh(time_remaining)
+            return bool(self.clusters.dirty)
+        precompute.add('cluster_graph', cluster_graph, optional=True)
+
+        reserve = ants.loadtime // 5
+        precompute.run(lambda: ants.load_remaining() - reserve)
+        # step -> milliseconds do_idle gave it since the last turn
+        self.idle_ms = {}
+        self.profiler.setup(setup_ms=dict(precompute.timings),
+                            pending=precompute.pending_names(),
+                            load_remaining_ms=ants.load_remaining())
 
     def do_turn(self, ants):
         # loop through all my ants and try to give them orders
         # the ant_loc is an ant location tuple in (row, col) form
         destination = ants.destination
+        neighbors = ants.neighbors
         direction = ants.direction
         distance = ants.distance
         visible = ants.visible
         passable = ants.passable
         unoccupied = ants.unoccupied
         time_remaining = ants.time_remaining
+        profiler = self.profiler
+        budget = self.budget
+        budget.start(ants.turn_start_time)
 
         orders = {}
         available_ants = set(ants.my_ants())
@@ -133,9 +255,8 @@ class MyBot:
             return False
 
         def get_adjacent(loc):
-            return [destination(loc, dir) for dir in ('n', 'e', 's', 'w')]
+            return neighbors(loc)
 
-        enemy_ants = set([loc for loc, owner in ants.enemy_ants()])
         enemy_hills = set([loc for loc, owner in ants.enemy_hills()])
 
         food_dists = []
@@ -144,257 +265,378 @@ class MyBot:
         explore_dists = []
         ant_proximity = {}
         enemy_proximity = {}
+        worker_fields = {}
         def update_visible():
             ' determine which squares are visible to the given player '
-            if not hasattr(ants, 'vision_offsets_2'):
-                # precalculate squares around an ant to set as visible
-                ants.vision_offsets_2 = []
-                mx = int(sqrt(ants.viewradius2))
-                for d_row in range(-mx, mx + 1):
-                    for d_col in range(-mx, mx + 1):
-                        d = d_row**2 + d_col**2
-                        if d <= ants.viewradius2:
-                            ants.vision_offsets_2.append((
-                                # Create all negative offsets so vision will
-                                # wrap around the edges properly
-                                (d_row % ants.rows) - ants.rows,
-                                (d_col % ants.cols) - ants.cols
-                                ))
-                            # set all spaces as not visible
-            # loop through ants and set all squares around ant as visible
-            ants.vision = [[False]*ants.cols for row in range(ants.rows)]
-            for ant in ants.my_ants():
-                a_row, a_col = ant
+            # one vision pass gives the vision grid and the squares seen for the first time
+            my_ants = ants.my_ants()
+            vision, new_locs, new_water = self.vision.update(my_ants, passable=passable)
+            ants.set_vision(vision)
+            for water_loc in new_water:
+                self.impassable.add(water_loc)
+                self.astar.block(water_loc)
+                self.clusters.block(water_loc)
+                self.stored_paths.invalidate(water_loc)
+                self.path_dists.invalidate(water_loc)
+                straight_paths.invalidate(water_loc)
+                for key, search in list(self.searches.items()):
+                    if search.crosses(water_loc):
+                        del self.searches[key]
+            if new_water:
+                self.water_version += 1
+                self.scents.invalidate(new_water)
+            self.seen.mark(new_locs, passable)
+            water_hints = self.water_hints
+            for explore_loc in new_locs:
+                self.hill_hints.discard(explore_loc)
+                if explore_loc in water_hints:
+                    water_hints.discard(explore_loc)
+                    if explore_loc not in self.impassable:
+                        # the snapshot was wrong about this square
+                        self.astar.unblock(explore_loc)
+                        self.clusters.unblock(explore_loc)
+                        self.scents.invalidate([explore_loc])
+                        self.water_version += 1
+                if explore_loc in self.impassable:
+                    continue
+                elif explore_loc in enemy_hills: 
+                    self.hills.add(explore_loc)
+            self.seen_hills.update(enemy_hills)
+            if self.fingerprint is None and self.snapshot_store is not None:
+                load_snapshot(new_water)
+            # places to explore are spread along the edge of what has been seen,
+            # and hills the last game on this map found that are still out of sight
+            self.explore_locs = set(self.seen.targets())
+            self.explore_locs.update(self.hill_hints)
+            for ant in my_ants:
                 ant_proximity[ant] = []
                 enemy_proximity[ant] = []
-                if ant in self.explore_locs:
-                    self.explore_locs.remove(ant)
-                for v_row, v_col in ants.vision_offsets_2:
-                    ants.vision[a_row + v_row][a_col + v_col] = True
-                    explore_loc = self.translator[a_row + v_row][a_col + v_col] 
-                    if explore_loc in self.unseen:
-                        self.unseen.remove(explore_loc)
-                        if not passable(explore_loc):
-                            self.impassable.add(explore_loc)
-                        elif explore_loc in enemy_hills: 
-                            self.hills.add(explore_loc)
-                        else:
-                            # explore locs are places to explore. 1 is added on average every 4x4 area.
-                            if randint(0, 15) == 2: 
-                                self.explore_locs.add(explore_loc)
-                    if explore_loc in food_locs:
-                        insort(food_dists, (fdistance(ant, explore_loc), ant, explore_loc))
-                    elif explore_loc in self.hills:
-                        # the hills is still there, store the distance to it
-                        if explore_loc in enemy_hills:
-                            insort(hill_dists, (fdistance(ant, explore_loc), ant, explore_loc))
-                        # else the hill has been razed, remove it
-                        else:
-                            self.hills.remove(explore_loc)
-                    elif explore_loc in self.explore_locs:
-                        insort(explore_dists, (fdistance(ant, explore_loc), ant, explore_loc))
-                    elif explore_loc in available_ants:
-                        insort(ant_proximity[ant], (fdistance(ant, explore_loc), ant, explore_loc))
-                    elif explore_loc in enemy_ants: 
-                        insort(enemy_proximity[ant], (fdistance(ant, explore_loc), explore_loc))
+            # the hill is in sight but no longer reported, it has been razed
+            for hill_loc in list(self.hills):
+                if visible(hill_loc) and hill_loc not in enemy_hills:
+                    self.hills.remove(hill_loc)
+
+            # the helper's fields are taken once this turn's targets are known
+            self.fresh_kinds = []
+            if self.worker is not None:
+                worker_fields.update(merge_worker())
+
+            self.hill_index.build(self.hills)
+            if self.target_mode == 'fields':
+                # target_fields reads the targets off the distance fields instead
+                return
+
+            # every (ant, target) pair within view radius, a square counts for one kind only
+            food_list = list(food_locs)
+            hill_list = [loc for loc in self.hills if loc not in food_locs]
+            explore_list = [loc for loc in self.explore_locs
+                            if loc not in food_locs and loc not in self.hills]
+            taken = food_locs.union(self.hills, self.explore_locs)
+            # one ant per food and explore target, every ant near a hill goes for the nearest one
+            solve = self.assigner.solve
+            food_dists.extend(solve(my_ants, food_list, fdistance, self.view_reach))
+            hill_dists.extend(solve(my_ants, hill_list, fdistance, self.view_reach, capacity=None))
+            explore_dists.extend(solve(my_ants, explore_list, fdistance, self.view_reach))
+            mine = ants.spatial('mine')
+            enemies = ants.spatial('enemy')
+            viewradius2 = ants.viewradius2
+            for ant in my_ants:
+                for d2, other in mine.within(ant, viewradius2):
+                    if other in available_ants and other not in taken:
+                        ant_proximity[ant].append((fdistance(ant, other), ant, other))
+                for d2, other in enemies.within(ant, viewradius2):
+                    if other not in taken:
+                        enemy_proximity[ant].append((fdistance(ant, other), other))
+                ant_proximity[ant].sort()
+                enemy_proximity[ant].sort()
 
             return 
+
+        def merge_worker():
+            'adopt the fields the helper computed since the last turn unless the map or targets moved on'
+            fresh_kinds = self.fresh_kinds
+            stale = []
+            result = self.worker.collect()
+            if result is not None:
+                water_version, computed = result
+                current = {'food': food_locs, 'hill': self.hills, 'explore': self.explore_locs}
+                for kind, sources in computed.items():
+                    if water_version == self.water_version and sources == current[kind]:
+                        dist, nearest = self.worker.fields(kind)
+                        self.fields[kind].adopt(sources, water_version, dist, nearest)
+                        fresh_kinds.append(kind)
+                    else:
+                        stale.append(kind)
+            return {'fresh': fresh_kinds, 'stale': stale}
+
+        def submit_worker():
+            'hand the helper the targets expected next turn, food next to where my ants end up is eaten'
+            landing = set(loc for loc, ant_loc in orders.items() if ant_loc is not None)
+            landing.update(available_ants)
+            food = set(loc for loc in food_locs
+                       if loc not in landing and not landing.intersection(neighbors(loc)))
+            self.worker.submit(self.astar.water, self.water_version,
+                               {'food': food, 'hill': self.hills,
+                                'explore': self.explore_locs.difference(landing)})
     
-        def find_path(start_loc, dest, threshold):
-            # A* is based on the heuristic h = f + g,
-            # where f = distance traveled so far and g = straightline distance to dest.
-            # fp and gp stand for 'f prime' and 'g prime'
+        def load_snapshot(first_water):
+            store = self.snapshot_store
+            self.fingerprint = store.fingerprint(ants.my_hills(), first_water)
+            snapshot = self.snapshot = store.load(self.fingerprint)
+            if snapshot is None:
+                return
+            locs = self.locs
+            seen = self.seen
+            for i in snapshot.water():
+                loc = locs[i]
+                if not seen.seen[i]:
+                    self.water_hints.add(loc)
+                    self.astar.block(loc)
+                    self.clusters.block(loc)
+            self.water_version += 1
+            for hill_loc in snapshot.hills():
+                if not seen.is_seen(hill_loc):
+                    self.hill_hints.add(hill_loc)
+
+        def find_path(start_loc, dest, threshold, deadline):
+            # the search itself lives in astar.AStar; it stops early on reaching
+            # a location that already has a stored path to dest.
             if start_loc == dest:
                 return start_loc
+            if (start_loc, dest) in self.stored_paths:
+                return self.stored_paths[(start_loc, dest)]
+            for kind in self.fresh_kinds:
+                field = self.fields[kind]
+                if field.target(start_loc) == dest:
+                    return field.next_step(start_loc)
+            if distance(start_loc, dest) > HPA_DISTANCE:
+                self.clusters.refresh(deadline.remaining)
+                next_step = self.clusters.next_step(start_loc, dest)
+                if next_step is not None:
+                    return next_step
             memoization = True
-            # frontier stores nodes which haven't yet been expanded.
-            # nodes are in form (h, f, location, parent)
-            frontier = []
-            # visited is simply a list of all explored locations
-            visited = set() 
-            # initialize variables
-            f = 0 
-            loc = start_loc
-            par = None
-            # loc is the current tile being examined.
-            # each loop iteration examines the frontier tile with lowest h value.
-            while loc != dest and (loc, dest) not in self.stored_paths: 
-                this_path_node = path_node(parent=par, location=loc)
-                # expand the frontier by adding adjacent locations
-                # if the location isn't passable or has already been visited, skip 
-                for adj_loc in filter(lambda l: l not in visited and l not in self.impassable, 
-                                      [destination(loc, dir) for dir in ('n', 'e', 's', 'w')]):
-                    # set f' and g'
-                    fp = f + 1 
-                    gp = int(distance(adj_loc, dest)*0.9)
-                    # add to frontier and visited
-                    insort(frontier, frontier_node(h_val=fp + gp, f_val=fp, location=adj_loc, parent=this_path_node))
-                    visited.add(adj_loc)
-                # dead end. This occurs when there is no visible path to dest
-                frontier_len = len(frontier)
-                if frontier_len == 0:
-                    return start_loc 
-                if f*threshold > time_remaining():
+            # asked of every node the search expands, so it stays out of the cache statistics
+            joins = lambda loc: self.stored_paths.has((loc, dest))
+            search = self.searches.pop((start_loc, dest), None)
+            if search is not None:
+                final_path = search.run(deadline.remaining, threshold, joins)
+            else:
+                final_path = self.astar.search(start_loc, dest, deadline.remaining, threshold,
+                                               joins=joins, resumable=True)
+                search = self.astar.suspended
+            if final_path is None and search is not None and not search.done:
+                # out of time, head for the best square found so far and carry
+                # on from there next turn
+                partial = search.best_path()
+                if not partial:
+                    next_step = start_loc
+                elif search.reroot(partial[0]):
+                    next_step = partial[0]
+                else:
                     return start_loc
-                # sort frontier, so the node with lowest h is at the front
-                # pop off node with the lowest h value for next iteration
-                h, f, loc, par = frontier.pop(0)
-            # prev is the previous location's parent
+                if len(self.searches) < MAX_SEARCHES:
+                    self.searches[(next_step, dest)] = search
+                return next_step
+            # dead end
+            if not final_path:
+                return start_loc
+            loc = final_path[-1]
             if (loc, dest) in self.path_dists:
                 path_dist_offset = self.path_dists[(loc, dest)] 
+                # a stored tail, the new entries lean on its cells too
+                tail_cells = list(self.path_dists.cells((loc, dest)))
             else:
                 path_dist_offset = 0
-            final_path = []
-            # loop retraces back to start_loc, ends when it finds the node with no parent
-            while par != None:
-                # if part of the path is unknown, it could potentially be a bad path
+                tail_cells = []
+            # if part of the path is unknown, it could potentially be a bad path
+            for loc in final_path:
                 if not visible(loc):
                     memoization = False
-                final_path.insert(0, loc)
-                next_par, loc = par
-                par = next_par
+                    break
+            # both caches drop the path when water turns up on any of its cells
+            path_cells = [start_loc] + final_path + tail_cells
             step = start_loc
             dist = len(final_path) + path_dist_offset
             reverse_dist = 0
+            dists = []
             for next_step in final_path:
-                self.path_dists[(step, dest)] = dist - reverse_dist
-                self.path_dists[(dest, step)] = reverse_dist 
+                dists.append(((step, dest), dist - reverse_dist))
+                dists.append(((dest, step), reverse_dist))
                 reverse_dist += 1
                 step = next_step
+            self.path_dists.add_path(path_cells, dists)
             if memoization:
                 step = start_loc
+                steps = []
                 for next_step in final_path:
-                    self.stored_paths[(step, dest)] = next_step
-                    self.stored_paths[(dest, next_step)] = step
+                    steps.append(((step, dest), next_step))
+                    steps.append(((dest, next_step), step))
                     step = next_step
-            if (start_loc, dest) in self.stored_paths:
-                return self.stored_paths[(start_loc, dest)]
-            else:
-                return final_path[0]
+                self.stored_paths.add_path(path_cells, steps)
+            return final_path[0]
+
+        def assault(advances):
+            '''the ants of advances, (ant, dest, hill) triples, that should hold
+            their square instead of stepping into a fight that loses more ants
+            than it kills'''
+            enemies = ants.spatial('enemy')
+            if not len(enemies):
+                return set()
+            danger_radius2 = self.danger_radius2
+            engaged = []
+            near_enemies = set()
+            for ant_loc, dest, hill_loc in advances:
+                nearby = enemies.within(dest, danger_radius2)
+                if nearby:
+                    engaged.append((ant_loc, dest))
+                    near_enemies.update(loc for d2, loc in nearby)
+            if not engaged:
+                return set()
+            engaged = engaged[:COMBAT_CANDIDATES - 3]
+            # my other ants near the fight are counted where they stand
+            moving = set(ant_loc for ant_loc, dest in engaged)
+            bystanders = set()
+            mine = ants.spatial('mine')
+            for enemy_loc in near_enemies:
+                for d2, loc in mine.within(enemy_loc, danger_radius2):
+                    if loc not in moving:
+                        bystanders.add(loc)
+            bystanders = list(bystanders)
+            owner_of = ants.ant_list
+            enemy_list = [(loc, owner_of[loc]) for loc in near_enemies]
+            front = set(ant_loc for ant_loc, dest in engaged
+                        if enemies.within(dest, ants.attackradius2))
+            # everyone advances, nobody does, the front line holds, or one ant holds
+            holds = [set(), moving, front] + [set([ant_loc]) for ant_loc, dest in engaged]
+            candidates = [[ant_loc if ant_loc in hold else dest for ant_loc, dest in engaged] + bystanders
+                          for hold in holds]
+            mine_list = [ant_loc for ant_loc, dest in engaged] + bystanders
+            results = self.combat.evaluate(mine_list, enemy_list, candidates)
+            best = 0
+            best_score = None
+            for i, (my_dead, enemy_dead) in enumerate(results):
+                score = enemy_dead - my_dead
+                if best_score is None or score > best_score:
+                    best = i
+                    best_score = score
+            return holds[best]
 
         def fdistance(start_loc, dest):
             if start_loc == dest:
                 return 0
             elif (start_loc, dest) not in self.path_dists:
+                for kind in self.fresh_kinds:
+                    field = self.fields[kind]
+                    if field.target(start_loc) == dest:
+                        return field.distance(start_loc)
+                if dest in self.hill_hints:
+                    # the walk the last game on this map measured, if dest was the nearest hill
+                    nearest = self.snapshot.nearest_hill(start_loc)
+                    if nearest is not None and nearest[1] == dest:
+                        return nearest[0]
                 return distance(start_loc, dest)
             else:
                 return self.path_dists[(start_loc, dest)]
 
-        def hill_MDP(start_loc):
-            if start_loc not in self.stored_MDPs: 
-                self.stored_MDPs[start_loc] = stored_MDP(frontier_lst=[(1, start_loc)], visited_set=set([start_loc]), cost_val=-2)
-                self.unseen.remove(start_loc)
-                self.impassable.remove(start_loc)
-            frontier, visited, cost = self.stored_MDPs[start_loc]
-            next_turn_frontier = [] 
-            while len(frontier) > 0:
-                value, frontier_loc = frontier.pop(0) 
-                next_value = value - cost
-                for adj_loc in [destination(loc, dir) for dir in ('n', 'e', 's', 'w')]:
-                    # if adj_loc has already been visited and a lower gradient than the current value, then 
-                    # we already have the most direct route. 
-                    # If it has a higher gradient than current, then we have found a more direct route to the tile,
-                    # so explore it again.
-                    if adj_loc in visited:
-                    #    if self.global_gradient[adj_loc] <= next_value:
-                            continue
-                    #    else:
-                    #        pass
-                    # adj_loc has not been visited, but it is visible. Uncharted territory, chart it.
-                    elif visible(adj_loc):
-                        self.unseen.remove(adj_loc)
-                        if passable(adj_loc):
-                            self.impassable.remove(adj_loc)
-                        # if adj_loc is impassable, add it to visited, but not to the frontier.
-                        else:
-                            self.global_gradient[adj_loc] = -100
-                            visited.add(adj_loc)
-                            continue
-                    # else, adj_loc has not been visited and is not visible. Since frontier_loc could have children
-                    # that cannot be accessed, it has to be re-added to frontier. Leave adj_loc alone.
-                    else:
-                        insort(next_turn_frontier, (value, frontier_loc))
-                        continue
-                    # If we reach this point, we know adj_loc needs to be added to the frontier.
-                    insort(frontier, (next_value, adj_loc))
-                    visited.add(adj_loc)
-                    self.global_gradient[adj_loc] = next_value
-                    if time_remaining() < 250:
-                        break
-            self.stored_MDPs[start_loc] = stored_MDP(frontier_lst=next_turn_frontier, visited_set=visited, cost_val=cost)
-            self.hill_MDP_frontier = next_turn_frontier
-            return
-
-        def MDP(loc, type):
-            if (loc, type) in self.stored_MDPs:
-                local_MDP = self.stored_MDPs[(loc, type)] 
-            else:
-                Q, cost = TYPE[type]
-                cost += randint(-2, 2)
-                if cost > 0:
-                    cost_increment = 1
-                else:
-                    cost_increment = -1
-                directions = ('n', 'e', 's', 'w')
-                frontier = [(loc, Q, cost)]
-                visited = []
-                local_MDP = []
-                while(True):
-                    if time_remaining() < 50:
-                        return
-                    if len(frontier) == 0: 
-                        break
-                    locp, Q, cost = frontier.pop(0)
-                    if Q == 0:
+        def target_fields():
+            # recompute only the fields whose targets or known water changed
+            fields = self.fields
+            fields['food'].update(food_locs, self.water_version)
+            fields['hill'].update(self.hills, self.water_version)
+            fields['explore'].update(self.explore_locs, self.water_version)
+            # hills in sight first, then one ant per food and explore target, then
+            # every ant left over heads for the nearest hill
+            view_dist = int(sqrt(ants.viewradius2))
+            for kind, max_dist, claim, phase in (('hill', view_dist, False, 'hills'),
+                                                 ('food', None, True, 'food'),
+                                                 ('explore', None, True, 'explore'),
+                                                 ('hill', None, False, 'fallback')):
+                field = fields[kind]
+                claimed = set()
+                deadline = budget.phase(phase)
+                dists = [(field.distance(ant_loc), ant_loc) for ant_loc in available_ants]
+                dists.sort()
+                for dist, ant_loc in dists:
+                    if deadline.expired():
                         break
-                    local_MDP.append((locp, Q))
-                    for direction in directions:
-                        dest = destination(locp, direction)
-                        if dest not in visited and dest not in [l for l, q, c in frontier] and passable(dest):
-                            frontier.append((dest, Q + cost, cost + cost_increment))
-                    visited.append(locp)
-                self.stored_MDPs[(loc, type)] = local_MDP[:]
-            for loc, Q in local_MDP:
-                row, col = loc
-                self.MDPs[row][col] += Q
-            return
+                    if dist <= 0 or (max_dist is not None and dist > max_dist):
+                        continue
+                    target_loc = field.target(ant_loc)
+                    if claim and target_loc in claimed:
+                        continue
+                    if do_move_location(ant_loc, field.next_step(ant_loc)):
+                        claimed.add(target_loc)
 
         # end function definitions
 
+        search_counters = {'nodes': lambda: self.astar.total_expanded,
+                           'cache_hits': lambda: self.stored_paths.hits}
+        find_path = profiler.wrap('find_path', find_path, search_counters)
+        assault = profiler.wrap('assault', assault)
+
+        profiler.mark('update_visible')
         update_visible()
+        self.astar.reset_stats()
+        # searches are dropped once their ant or their target is gone
+        targets = food_locs.union(self.hills, self.explore_locs)
+        for key in list(self.searches):
+            ant_loc, dest = key
+            if ant_loc not in available_ants or dest not in targets:
+                del self.searches[key]
         new_bookkeeping = []
 
         # Prevent stepping on own hill
         for hill_loc in ants.my_hills():
             orders[hill_loc] = None
 
+        if self.target_mode == 'fields':
+            # the field targeting replaces the per pair loops below
+            profiler.mark('fields')
+            target_fields()
+            self.bookkeeping = []
+
+        profiler.mark('hills')
+        deadline = budget.phase('hills')
+        advances = []
         for dist, ant_loc, hill_loc in hill_dists:
-            if time_remaining() < 10:
+            if deadline.expired():
                 break
             if ant_loc not in available_ants:
                 continue
-            dest = find_path(ant_loc, hill_loc, 5)
+            dest = find_path(ant_loc, hill_loc, 5, deadline)
+            advances.append((ant_loc, dest, hill_loc))
+        holding = assault(advances)
+        for ant_loc, dest, hill_loc in advances:
+            if ant_loc in holding:
+                # stay put and keep the square from being moved onto
+                orders[ant_loc] = ant_loc
+                available_ants.discard(ant_loc)
+                continue
             do_move_location(ant_loc, dest)
             if (dest, hill_loc) in self.stored_paths:
                 new_bookkeeping.append(('hill', dest, hill_loc))
 
+        profiler.mark('food')
+        deadline = budget.phase('food')
         food_targets = set() 
         # find close food
         for dist, ant_loc, food_loc in food_dists:
-            if time_remaining() < 10:
+            if deadline.expired():
                 break
             if ant_loc not in available_ants:
                 continue
             if food_loc not in food_targets:
                 food_targets.add(food_loc)
-                dest = find_path(ant_loc, food_loc, 12)
+                dest = find_path(ant_loc, food_loc, 12, deadline)
                 do_move_location(ant_loc, dest)
                 if (dest, food_loc) in self.stored_paths:
                     new_bookkeeping.append(('food', dest, food_loc))
 
+        profiler.mark('bookkeeping')
+        deadline = budget.phase('bookkeeping')
         explore_targets = set()
         for type, ant_loc, target_loc in self.bookkeeping:
-            if time_remaining() < 10:
+            if deadline.expired():
                 break
             if ant_loc not in available_ants:
                 continue
@@ -426,52 +668,60 @@ class MyBot:
         self.bookkeeping = new_bookkeeping
 
         # explore the map
-        if time_remaining() > 50:
-            for dist, ant_loc, explore_loc in explore_dists:
-                if time_remaining() < 10:
-                    break
-                if ant_loc not in available_ants or explore_loc in explore_targets:
-                    continue
-                else:
-                    dest = find_path(ant_loc, explore_loc, 10)
-                    do_move_location(ant_loc, dest)
-                    if (dest, explore_loc) in self.stored_paths:
-                        self.bookkeeping.append(('explore', dest, explore_loc))
+        profiler.mark('explore')
+        deadline = budget.phase('explore')
+        for dist, ant_loc, explore_loc in explore_dists:
+            if deadline.expired():
+                break
+            if ant_loc not in available_ants or explore_loc in explore_targets:
+                continue
+            else:
+                dest = find_path(ant_loc, explore_loc, 10, deadline)
+                do_move_location(ant_loc, dest)
+                if (dest, explore_loc) in self.stored_paths:
+                    self.bookkeeping.append(('explore', dest, explore_loc))
         
-        if time_remaining() > 50:
+        profiler.mark('fallback')
+        deadline = budget.phase('fallback')
+        if self.target_mode == 'paths':
             dists = []
             for ant in list(available_ants):
-                if time_remaining() < 50:
+                if deadline.expired():
                     break
-                dists = [(fdistance(ant, hill_loc), hill_loc) for hill_loc in self.hills]
+                dists = [(fdistance(ant, hill_loc), hill_loc)
+                         for d, hill_loc in self.hill_index.nearest(ant, FALLBACK_TARGETS)]
                 dists.sort()
                 for dist, hill_loc in dists:
-                    if time_remaining < 10:
+                    if deadline.expired():
                         break
-                    dest = find_path(ant, hill_loc, 3)
+                    dest = find_path(ant, hill_loc, 3, deadline)
                     if do_move_location(ant, dest):
                         if (dest, hill_loc) in self.stored_paths:
                             self.bookkeeping.append(('hill', dest, hill_loc))
                         break
 
-        if ants.time_remaining() > 50:
-            dists = []
+        if self.target_mode == 'paths' and not deadline.expired():
+            # the rest walk down the distance field of the frontier, one search
+            # for all of them, the targets are on the edge of the known map and
+            # rarely within reach of a cheap find_path
+            field = self.fields['explore']
+            field.update(self.explore_locs, self.water_version)
             for ant in list(available_ants):
-               if ants.time_remaining() < 50:
+                if deadline.expired():
                     break
-               dists = [(fdistance(ant, explore_loc), explore_loc) 
-                         for explore_loc in self.explore_locs if explore_loc not in explore_targets]
-               dists.sort()
-               for dist, explore_loc in dists:
-                   if ants.time_remaining() < 10:
-                        break
-                   dest = find_path(ant, explore_loc, 3)
-                   if do_move_location(ant, dest):
-                       if (dest, explore_loc) in self.stored_paths:
-                           self.bookkeeping.append(('explore', dest, explore_loc))
-                       break
-
-        for ant in available_ants:
+                do_move_location(ant, field.next_step(ant))
+
+        # whoever is left follows the scent while there is time to spread it
+        profiler.mark('scents')
+        scents = None
+        if available_ants and not deadline.expired():
+            scents = self.scents
+            scents.update({'food': food_locs, 'hill': self.hills, 'fog': self.explore_locs})
+        for ant in list(available_ants):
+            if scents is not None:
+                step = scents.climb(ant)
+                if step is not None and do_move_location(ant, step):
+                    continue
             for dir in ('n', 'e', 's', 'w'):
                 if do_move_direction(ant, dir): 
                     break
@@ -483,6 +733,43 @@ class MyBot:
                     if do_move_direction(hill_loc, direction):
                         break
 
+        # idle time goes to the setup steps the loadtime had no room for
+        deferred = {}
+        if self.precompute.pending:
+            deferred = self.precompute.run_pending(budget.remaining)
+        worker_stats = None
+        if self.worker is not None:
+            submit_worker()
+            worker_stats = dict(self.worker.stats(), **worker_fields)
+
+        profiler.end_turn(ants=len(ants.my_ants()),
+                          remaining_ms=time_remaining(),
+                          budget=budget.finish(),
+                          deferred_ms=deferred,
+                          idle_ms=self.idle_ms,
+                          worker=worker_stats,
+                          stored_paths=self.stored_paths.stats())
+        self.idle_ms = {}
+
+    def do_idle(self, ants, time_remaining):
+        'between turns under Ants.run_threaded, the pending setup steps go on'
+        if self.precompute.pending:
+            for name, ms in self.precompute.run_pending(time_remaining).items():
+                self.idle_ms[name] = round(self.idle_ms.get(name, 0) + ms, 3)
+
+    def do_end(self, ants):
+        'keep what this game learned about the map for the next game on it'
+        self.profiler.close()
+        if self.worker is not None:
+            self.worker.close()
+            self.worker = None
+        if self.snapshot_store is None or self.fingerprint is None:
+            return
+        if self.snapshot is not None:
+            self.snapshot.close()
+            self.snapshot = None
+        self.snapshot_store.save(self.fingerprint, self.impassable | self.water_hints,
+                                 self.seen_hills | self.hill_hints)
 
 
 if __name__ == '__main__':
@@ -497,6 +784,11 @@ if __name__ == '__main__':
         # if run is passed a class with a do_turn method, it will do the work
         # this is not needed, in which case you will need to write your own
         # parsing function and your own game state class
-        Ants.run(MyBot())
+        # --threaded reads the next turn on a thread and gives do_idle the time
+        # in between, until it has been benchmarked against the plain loop
+        if '--threaded' in sys.argv[1:]:
+            Ants.run_threaded(MyBot())
+        else:
+            Ants.run(MyBot())
     except KeyboardInterrupt:
         print('ctrl-c, leaving ...')
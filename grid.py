@@ -0,0 +1,56 @@
+#!/usr/bin/env python
+
+from array import array
+
+# numpy is optional, it only adds zero-copy array views of a grid
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+NUMPY_TYPES = {'b': 'int8', 'B': 'uint8'}
+
+class Grid:
+    'a rows x cols map stored row-major in one flat array, indexed by row*cols + col'
+    def __init__(self, rows, cols, value=0, typecode='b'):
+        self.rows = rows
+        self.cols = cols
+        self.size = rows * cols
+        self.typecode = typecode
+        self.data = array(typecode, [value]) * self.size
+        self.blanks = {}
+
+    def index(self, loc):
+        row, col = loc
+        return row * self.cols + col
+
+    def location(self, index):
+        return divmod(index, self.cols)
+
+    def get(self, loc):
+        row, col = loc
+        return self.data[row * self.cols + col]
+
+    def set(self, loc, value):
+        row, col = loc
+        self.data[row * self.cols + col] = value
+
+    def fill(self, value):
+        'reset every cell in place, the blank row-major copy is built only once per value'
+        if value not in self.blanks:
+            self.blanks[value] = array(self.typecode, [value]) * self.size
+        self.data[:] = self.blanks[value]
+
+    def cells(self, value):
+        'return the indexes of all cells holding value'
+        return [i for i, v in enumerate(self.data) if v == value]
+
+    def row(self, row):
+        return self.data[row * self.cols:(row + 1) * self.cols]
+
+    def numpy(self):
+        'return a (rows, cols) numpy view sharing memory with the grid'
+        if numpy is None:
+            raise ImportError('numpy is not available')
+        view = numpy.frombuffer(self.data, dtype=NUMPY_TYPES[self.typecode])
+        return view.reshape(self.rows, self.cols)
@@ -0,0 +1,245 @@
+#!/usr/bin/env python
+
+from heapq import heappush, heappop
+from collections import deque, defaultdict
+
+# hierarchical path finding over the known map. The map is cut into square
+# clusters; every run of open squares along the border of two clusters gets
+# one or two entrances, and the distances between the entrances of a cluster
+# are found with a breadth first search that stays inside it. Long routes are
+# planned over that small graph of entrances and only the first hop is walked
+# on the real map. Cells are flat indexes, row*cols + col, as in astar.
+
+class ClusterMap:
+    def __init__(self, rows, cols, water, neighbors, size=10):
+        self.rows = rows
+        self.cols = cols
+        self.size = size
+        # shared with whoever learns the map, nonzero marks water
+        self.water = water
+        self.neighbors = neighbors
+        self.locs = [(row, col) for row in range(rows) for col in range(cols)]
+        self.crows = (rows + size - 1) // size
+        self.ccols = (cols + size - 1) // size
+        count = self.crows * self.ccols
+        self.cluster_of = [(row // size) * self.ccols + col // size
+                           for row in range(rows) for col in range(cols)]
+        # entrance -> entrances across a border, each a step of 1
+        self.links = defaultdict(set)
+        # (cluster, 's' or 'e') -> the (cell, cell) entrance pairs on that border
+        self.borders = {}
+        self.entrances = [set() for c in range(count)]
+        # per cluster: entrance -> {entrance: steps inside the cluster}
+        self.intra = [{} for c in range(count)]
+        self.dirty = set(range(count))
+        # dest -> {entrance: steps to dest}, valid for one version of the graph
+        self.goal_trees = {}
+        self.max_trees = 64
+        self.version = 0
+        self.rebuilt = 0
+
+    def block(self, loc):
+        'new water at loc, its cluster is rebuilt on the next refresh'
+        self.mark_dirty(loc)
+
+    def unblock(self, loc):
+        'water at loc turned out to be land, its cluster is rebuilt on the next refresh'
+        self.mark_dirty(loc)
+
+    def mark_dirty(self, loc):
+        'the cluster of loc has to be rebuilt before the next route through it'
+        row, col = loc
+        self.dirty.add(self.cluster_of[row * self.cols + col])
+
+    def south(self, c):
+        return ((c // self.ccols + 1) % self.crows) * self.ccols + c % self.ccols
+
+    def east(self, c):
+        return (c // self.ccols) * self.ccols + (c % self.ccols + 1) % self.ccols
+
+    def north(self, c):
+        return ((c // self.ccols - 1) % self.crows) * self.ccols + c % self.ccols
+
+    def west(self, c):
+        return (c // self.ccols) * self.ccols + (c % self.ccols - 1) % self.ccols
+
+    def border_cells(self, c, side):
+        'the (inside, outside) cell pairs across the south or east edge of cluster c'
+        rows, cols, size = self.rows, self.cols, self.size
+        c_row, c_col = c // self.ccols, c % self.ccols
+        pairs = []
+        if side == 's':
+            row = min((c_row + 1) * size, rows) - 1
+            for col in range(c_col * size, min((c_col + 1) * size, cols)):
+                pairs.append((row * cols + col, ((row + 1) % rows) * cols + col))
+        else:
+            col = min((c_col + 1) * size, cols) - 1
+            for row in range(c_row * size, min((c_row + 1) * size, rows)):
+                pairs.append((row * cols + col, row * cols + (col + 1) % cols))
+        return pairs
+
+    def build_border(self, c, side):
+        'place entrances along one border, one per open run or one at each end of a long run'
+        for a, b in self.borders.pop((c, side), ()):
+            self.links[a].discard(b)
+            self.links[b].discard(a)
+        other = self.south(c) if side == 's' else self.east(c)
+        if other == c:
+            # a single cluster across the map, the wrap is inside it
+            return
+        water = self.water
+        runs = []
+        run = []
+        for a, b in self.border_cells(c, side):
+            if water[a] or water[b]:
+                if run:
+                    runs.append(run)
+                run = []
+            else:
+                run.append((a, b))
+        if run:
+            runs.append(run)
+        pairs = []
+        for run in runs:
+            if len(run) < 6:
+                pairs.append(run[len(run) // 2])
+            else:
+                pairs.append(run[0])
+                pairs.append(run[-1])
+        for a, b in pairs:
+            self.links[a].add(b)
+            self.links[b].add(a)
+        self.borders[(c, side)] = pairs
+
+    def bfs(self, c, source):
+        'steps and parents from source to every square of cluster c it can reach inside c'
+        water = self.water
+        neighbors = self.neighbors
+        cluster_of = self.cluster_of
+        dist = {source: 0}
+        parent = {source: -1}
+        frontier = deque([source])
+        while frontier:
+            i = frontier.popleft()
+            d = dist[i] + 1
+            for j in neighbors[i]:
+                if j not in dist and not water[j] and cluster_of[j] == c:
+                    dist[j] = d
+                    parent[j] = i
+                    frontier.append(j)
+        return dist, parent
+
+    def refresh(self, time_remaining=None):
+        '''rebuild the borders and entrance distances around clusters with new
+        water. Given time_remaining it goes a cluster at a time until that
+        runs out, otherwise all dirty clusters are rebuilt in one pass.'''
+        if time_remaining is None:
+            if self.dirty:
+                self.rebuild(self.dirty)
+                self.dirty = set()
+            return
+        while self.dirty and time_remaining() > 0:
+            self.rebuild([self.dirty.pop()])
+
+    def rebuild(self, clusters):
+        borders = set()
+        for c in clusters:
+            borders.add((c, 's'))
+            borders.add((c, 'e'))
+            borders.add((self.north(c), 's'))
+            borders.add((self.west(c), 'e'))
+        affected = set()
+        for c, side in borders:
+            self.build_border(c, side)
+            affected.add(c)
+            affected.add(self.south(c) if side == 's' else self.east(c))
+        cluster_of = self.cluster_of
+        for c in affected:
+            entrances = set()
+            for border in ((c, 's'), (c, 'e'), (self.north(c), 's'), (self.west(c), 'e')):
+                for a, b in self.borders.get(border, ()):
+                    entrances.add(a if cluster_of[a] == c else b)
+            intra = {}
+            for e in entrances:
+                dist, parent = self.bfs(c, e)
+                intra[e] = dict((other, dist[other]) for other in entrances
+                                if other != e and other in dist)
+            self.entrances[c] = entrances
+            self.intra[c] = intra
+        self.rebuilt += len(affected)
+        self.version += 1
+        self.goal_trees = {}
+
+    def goal_tree(self, goal):
+        'steps from every entrance that can reach goal, by Dijkstra over the entrance graph'
+        tree = self.goal_trees.get(goal)
+        if tree is not None:
+            return tree
+        if len(self.goal_trees) >= self.max_trees:
+            self.goal_trees = {}
+        cluster_of = self.cluster_of
+        intra = self.intra
+        links = self.links
+        gc = cluster_of[goal]
+        goal_dist, parent = self.bfs(gc, goal)
+        tree = {}
+        frontier = []
+        for e in self.entrances[gc]:
+            if e in goal_dist:
+                heappush(frontier, (goal_dist[e], e))
+        while frontier:
+            d, i = heappop(frontier)
+            if i in tree:
+                continue
+            tree[i] = d
+            for j, step in intra[cluster_of[i]].get(i, {}).items():
+                if j not in tree:
+                    heappush(frontier, (d + step, j))
+            for j in links.get(i, ()):
+                if j not in tree:
+                    heappush(frontier, (d + 1, j))
+        self.goal_trees[goal] = tree
+        return tree
+
+    def route(self, start_loc, dest):
+        '''(steps, next location) of a short route from start_loc to dest, None if
+        there is none. Clusters still waiting for refresh() are used as they were.'''
+        cols = self.cols
+        start = start_loc[0] * cols + start_loc[1]
+        goal = dest[0] * cols + dest[1]
+        if start == goal:
+            return 0, start_loc
+        if self.water[goal]:
+            return None
+        tree = self.goal_tree(goal)
+        c = self.cluster_of[start]
+        dist, parent = self.bfs(c, start)
+        best = None
+        via = -1
+        if self.cluster_of[goal] == c and goal in dist:
+            best = dist[goal]
+            via = goal
+        for e in self.entrances[c]:
+            if e != start and e in dist and e in tree:
+                steps = dist[e] + tree[e]
+                if best is None or steps < best:
+                    best = steps
+                    via = e
+        for j in self.links.get(start, ()):
+            if j in tree and (best is None or 1 + tree[j] < best):
+                best = 1 + tree[j]
+                via = j
+        if best is None:
+            return None
+        if via in dist:
+            # walk back to the square next to start
+            while parent[via] != start:
+                via = parent[via]
+        return best, self.locs[via]
+
+    def next_step(self, start_loc, dest):
+        'the first step of a short route from start_loc to dest, None if there is none'
+        route = self.route(start_loc, dest)
+        if route is None:
+            return None
+        return route[1]
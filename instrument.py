@@ -0,0 +1,100 @@
+#!/usr/bin/env python
+
+import json
+import time
+import threading
+
+try:
+    from Queue import Queue
+except ImportError:
+    from queue import Queue
+
+# per turn timing of named phases and of wrapped calls. Records are handed to
+# a writer thread as one JSON line per turn so the turn never waits on disk.
+# A disabled profiler hands back the original functions and does nothing else.
+
+class Profiler:
+    def __init__(self, path=None, enabled=True):
+        self.enabled = enabled and path is not None
+        self.path = path
+        self.turn = 0
+        # phase -> seconds, call name -> {'count', 'ms', counters...}
+        self.phases = {}
+        self.calls = {}
+        self.current = None
+        self.mark_time = None
+        self.records = None
+        if self.enabled:
+            self.records = Queue()
+            writer = threading.Thread(target=self.write_records)
+            writer.daemon = True
+            writer.start()
+
+    def write_records(self):
+        output = open(self.path, 'w')
+        while True:
+            record = self.records.get()
+            if record is None:
+                break
+            output.write(json.dumps(record, sort_keys=True) + '\n')
+            output.flush()
+        output.close()
+
+    def mark(self, phase):
+        'end the running phase and start the named one, None just ends it'
+        if not self.enabled:
+            return
+        now = time.time()
+        if self.current is not None:
+            self.phases[self.current] = self.phases.get(self.current, 0.0) + now - self.mark_time
+        self.current = phase
+        self.mark_time = now
+
+    def wrap(self, name, func, counters=None):
+        '''time every call of func under name. counters maps a counter name to a
+        function returning a running total, the per call increase is summed.'''
+        if not self.enabled:
+            return func
+        calls = self.calls
+        counters = list((counters or {}).items())
+        def timed(*args):
+            before = [counter() for key, counter in counters]
+            start = time.time()
+            result = func(*args)
+            elapsed = time.time() - start
+            stats = calls.get(name)
+            if stats is None:
+                stats = calls[name] = {'count': 0, 'ms': 0.0}
+            stats['count'] += 1
+            stats['ms'] += elapsed * 1000
+            for (key, counter), value in zip(counters, before):
+                stats[key] = stats.get(key, 0) + counter() - value
+            return result
+        return timed
+
+    def setup(self, **extra):
+        'queue a record for the setup, as turn 0'
+        if not self.enabled:
+            return
+        record = {'turn': 0}
+        record.update(extra)
+        self.records.put(record)
+
+    def end_turn(self, **extra):
+        'close the turn and queue its record'
+        if not self.enabled:
+            return
+        self.mark(None)
+        self.turn += 1
+        record = {'turn': self.turn,
+                  'phases_ms': dict([(phase, round(seconds * 1000, 3))
+                                     for phase, seconds in self.phases.items()]),
+                  'calls': self.calls}
+        record.update(extra)
+        self.records.put(record)
+        self.phases = {}
+        self.calls = {}
+
+    def close(self):
+        if self.enabled:
+            self.records.put(None)
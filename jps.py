@@ -0,0 +1,140 @@
+#!/usr/bin/env python
+
+from heapq import heappush, heappop
+
+from astar import AStar
+
+# jump point search for the 4-connected torus. Straight runs of open squares
+# are skipped over by jump() and only the squares where a turn can matter go
+# on the heap. Directions index the n, e, s, w neighbor tuples of astar, so
+# d ^ 2 is the opposite direction and odd directions are horizontal.
+
+class JumpPoint(AStar):
+    def __init__(self, rows, cols, water=None, neighbors=None):
+        AStar.__init__(self, rows, cols, water, neighbors)
+        # the direction each jump point was reached in, -1 for the start
+        self.arrived = [-1] * (rows * cols)
+        # squares stepped over by jumps in the last search
+        self.scanned = 0
+
+    def jump(self, i, d, goal):
+        '''step from i in direction d to the next jump point, returns (index, steps)
+        or (-1, steps) when the run ends in water or wraps all the way round'''
+        water = self.water
+        neighbors = self.neighbors
+        limit = self.cols if d & 1 else self.rows
+        steps = 0
+        point = -1
+        while steps < limit:
+            prev = i
+            i = neighbors[i][d]
+            steps += 1
+            if water[i]:
+                break
+            if i == goal:
+                point = i
+                break
+            here = neighbors[i]
+            behind = neighbors[prev]
+            if d & 1:
+                # moving east or west, a square opening up north or south is forced
+                if (not water[here[0]] and water[behind[0]]) or (not water[here[2]] and water[behind[2]]):
+                    point = i
+                    break
+            else:
+                if (not water[here[1]] and water[behind[1]]) or (not water[here[3]] and water[behind[3]]):
+                    point = i
+                    break
+                # a vertical run stops wherever a horizontal jump from it finds something
+                if self.jump(i, 1, goal)[0] >= 0 or self.jump(i, 3, goal)[0] >= 0:
+                    point = i
+                    break
+        self.scanned += steps
+        return point, steps
+
+    def search(self, start_loc, dest, time_remaining, threshold, joins=None, weight=0.9, resumable=False):
+        '''same contract as AStar.search, but joins is only tried at jump points
+        and a search that runs out of time is never kept for resuming.'''
+        rows = self.rows
+        cols = self.cols
+        water = self.water
+        neighbors = self.neighbors
+        row_of = self.row_of
+        col_of = self.col_of
+        locs = self.locs
+        g = self.g
+        parent = self.parent
+        arrived = self.arrived
+        opened = self.opened
+        closed = self.closed
+        self.search_id += 1
+        sid = self.search_id
+        self.calls += 1
+        self.suspended = None
+        self.scanned = 0
+
+        start = self.index(start_loc)
+        goal = self.index(dest)
+        dest_row, dest_col = dest
+        g[start] = 0
+        parent[start] = -1
+        arrived[start] = -1
+        opened[start] = sid
+        frontier = [(self.heuristic(start, dest_row, dest_col, weight), 0, start)]
+        expanded = 0
+        found = -1
+        while frontier:
+            f, gc, i = heappop(frontier)
+            gc = -gc
+            if closed[i] == sid or gc > g[i]:
+                continue
+            if i == goal or (joins is not None and i != start and joins(locs[i])):
+                found = i
+                break
+            closed[i] = sid
+            expanded += 1
+            if not expanded & 15 and gc * threshold > time_remaining():
+                break
+            d = arrived[i]
+            if d < 0:
+                directions = (0, 1, 2, 3)
+            elif d & 1:
+                directions = (d, 0, 2)
+            else:
+                directions = (d, 1, 3)
+            for d in directions:
+                if water[neighbors[i][d]]:
+                    continue
+                j, steps = self.jump(i, d, goal)
+                if j < 0 or closed[j] == sid:
+                    continue
+                gp = gc + steps
+                if opened[j] == sid and g[j] <= gp:
+                    continue
+                opened[j] = sid
+                g[j] = gp
+                parent[j] = i
+                arrived[j] = d
+                d_row = abs(row_of[j] - dest_row)
+                d_col = abs(col_of[j] - dest_col)
+                h = int((min(d_row, rows - d_row) + min(d_col, cols - d_col)) * weight)
+                heappush(frontier, (gp + h, -gp, j))
+        self.expanded = expanded
+        self.total_expanded += expanded
+        if found < 0:
+            return None
+        # fill in the straight runs between jump points
+        path = []
+        i = found
+        while i != start:
+            p = parent[i]
+            d = arrived[i] ^ 2
+            run = []
+            j = i
+            while j != p:
+                run.append(locs[j])
+                j = neighbors[j][d]
+            path.extend(run)
+            i = p
+        path.reverse()
+        return path
@@ -0,0 +1,81 @@
+#!/usr/bin/env python
+
+import random
+from array import array
+
+import pykernels
+
+# the search kernels, compiled from ckernels.pyx when that has been built
+# (./setup_kernels.py build_ext --inplace) and from pykernels otherwise.
+# water must be a buffer of unsigned bytes, a bytearray or array('B'), for
+# the compiled kernels to take it. The bots only call bfs so far, astar and
+# diffuse have no caller yet.
+try:
+    import ckernels as backend
+    compiled = True
+except ImportError:
+    backend = pykernels
+    compiled = False
+
+bfs = backend.bfs
+astar = backend.astar
+diffuse = backend.diffuse
+
+def prepare(rows, cols, neighbors=None):
+    '''build the tables the kernels keep per map size ahead of the first call,
+    neighbors can hand over an n, e, s, w table already built, Ants.neighbor_index'''
+    if not compiled:
+        if neighbors is not None:
+            pykernels.neighbor_tables[(rows, cols)] = neighbors
+        else:
+            pykernels.neighbor_table(rows, cols)
+
+def crosscheck(other=None, trials=50, seed=0):
+    '''run pykernels and other, ckernels by default, on the same random maps
+    and return a list of the differences found, empty when they agree'''
+    if other is None:
+        import ckernels as other
+    rng = random.Random(seed)
+    problems = []
+    for trial in range(trials):
+        rows = rng.randint(4, 40)
+        cols = rng.randint(4, 40)
+        size = rows * cols
+        water = bytearray(size)
+        for i in range(size):
+            if rng.random() < 0.3:
+                water[i] = 1
+        land = [i for i in range(size) if not water[i]]
+        if len(land) < 2:
+            continue
+        sources = rng.sample(land, min(len(land), rng.randint(1, 5)))
+        limit = rng.choice([-1, rng.randint(0, 20)])
+        expected = pykernels.bfs(rows, cols, water, sources, limit)
+        found = other.bfs(rows, cols, water, sources, limit)
+        if list(expected[0]) != list(found[0]) or list(expected[1]) != list(found[1]):
+            problems.append(('bfs', rows, cols, sources, limit))
+        start, goal = rng.sample(land, 2)
+        weight = rng.choice([0.5, 0.9, 1.0, 1.5])
+        expected = pykernels.astar(rows, cols, water, start, goal, weight)
+        found = other.astar(rows, cols, water, start, goal, weight)
+        if expected != found:
+            problems.append(('astar', rows, cols, start, goal, weight))
+        value = rng.randint(1, 150)
+        cost = rng.randint(-10, 2)
+        inc = rng.choice([-1, 0, 1])
+        expected_out = array('i', [0]) * size
+        found_out = array('i', [0]) * size
+        expected = pykernels.diffuse(rows, cols, water, start, value, cost, inc, expected_out)
+        found = other.diffuse(rows, cols, water, start, value, cost, inc, found_out)
+        if expected != found or expected_out != found_out:
+            problems.append(('diffuse', rows, cols, start, value, cost, inc))
+    return problems
+
+if __name__ == '__main__':
+    if not compiled:
+        print('ckernels is not built, nothing to check against')
+    else:
+        problems = crosscheck()
+        for problem in problems:
+            print(problem)
+        print('%d differences' % len(problems))
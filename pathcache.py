@@ -0,0 +1,124 @@
+#!/usr/bin/env python
+
+from collections import OrderedDict, defaultdict
+
+class PathCache:
+    '''a bounded mapping of (location, dest) keys to cached path data.
+    Entries are added a whole path at a time. The least recently used entry
+    is evicted once max_entries is reached, and a reverse index from cells to
+    the paths crossing them lets invalidate(loc) drop exactly the paths that
+    newly discovered water has made wrong.'''
+    def __init__(self, max_entries=50000):
+        self.max_entries = max_entries
+        # key -> (value, path id), oldest first
+        self.entries = OrderedDict()
+        # path id -> [live entry count, cells, keys]
+        self.paths = {}
+        self.cell_paths = defaultdict(set)
+        self.next_path = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def has(self, key):
+        'membership without counting a hit or a miss, for probes that are not lookups'
+        return key in self.entries
+
+    def __contains__(self, key):
+        if key in self.entries:
+            self.hits += 1
+            return True
+        self.misses += 1
+        return False
+
+    def __getitem__(self, key):
+        # reinserting moves the entry to the young end
+        entry = self.entries.pop(key)
+        self.entries[key] = entry
+        return entry[0]
+
+    def get(self, key, default=None):
+        if key in self:
+            return self[key]
+        return default
+
+    def cells(self, key):
+        'the squares the entry for key depends on'
+        return self.paths[self.entries[key][1]][1]
+
+    def add_path(self, cells, entries):
+        'store (key, value) entries that all depend on the squares in cells'
+        path_id = self.next_path
+        self.next_path += 1
+        cells = set(cells)
+        keys = []
+        for key, value in OrderedDict(entries).items():
+            if key in self.entries:
+                self.discard(key)
+            self.entries[key] = (value, path_id)
+            keys.append(key)
+        if not keys:
+            return path_id
+        self.paths[path_id] = [len(keys), cells, keys]
+        for cell in cells:
+            self.cell_paths[cell].add(path_id)
+        while len(self.entries) > self.max_entries:
+            key, (value, old_path) = self.entries.popitem(last=False)
+            self.release(old_path)
+            self.evictions += 1
+        return path_id
+
+    def discard(self, key):
+        'remove a single entry'
+        if key in self.entries:
+            value, path_id = self.entries.pop(key)
+            self.release(path_id)
+
+    def release(self, path_id):
+        'one entry of a path is gone, forget the path with its last entry'
+        path = self.paths.get(path_id)
+        if path is None:
+            return
+        path[0] -= 1
+        if path[0] <= 0:
+            self.forget(path_id)
+
+    def forget(self, path_id):
+        count, cells, keys = self.paths.pop(path_id)
+        for cell in cells:
+            cell_paths = self.cell_paths.get(cell)
+            if cell_paths is not None:
+                cell_paths.discard(path_id)
+                if not cell_paths:
+                    del self.cell_paths[cell]
+
+    def invalidate(self, loc):
+        'drop every path that crosses loc, returns the number of entries dropped'
+        dropped = 0
+        for path_id in list(self.cell_paths.get(loc, ())):
+            count, cells, keys = self.paths[path_id]
+            for key in keys:
+                entry = self.entries.get(key)
+                if entry is not None and entry[1] == path_id:
+                    del self.entries[key]
+                    dropped += 1
+            self.forget(path_id)
+            self.invalidations += 1
+        return dropped
+
+    def clear(self):
+        self.entries.clear()
+        self.paths.clear()
+        self.cell_paths.clear()
+
+    def stats(self):
+        return {'entries': len(self.entries),
+                'paths': len(self.paths),
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations}
@@ -0,0 +1,59 @@
+#!/usr/bin/env python
+
+import time
+
+# the static tables of a bot built as named steps during the loadtime. Every
+# step is called with a time_remaining function and returns True when it
+# stopped with work left over. Required steps run to the end whatever the
+# clock says; optional ones run while the loadtime lasts and are otherwise left
+# pending, for run_pending() to finish on the idle time at the end of turns.
+
+class Precompute:
+    def __init__(self):
+        self.steps = []
+        self.pending = []
+        # name -> milliseconds spent in the step so far
+        self.timings = {}
+        # name -> milliseconds spent in the step by the last run_pending
+        self.last_run = {}
+
+    def add(self, name, func, optional=False):
+        self.steps.append((name, func, optional))
+
+    def call(self, name, func, time_remaining):
+        start = time.time()
+        unfinished = func(time_remaining)
+        elapsed = round(1000 * (time.time() - start), 3)
+        self.timings[name] = round(self.timings.get(name, 0) + elapsed, 3)
+        self.last_run[name] = round(self.last_run.get(name, 0) + elapsed, 3)
+        return unfinished
+
+    def run(self, time_remaining):
+        '''run the steps added so far in order, time_remaining gives the loadtime
+        left in milliseconds. Optional steps left over once it runs out, or that
+        stop early, wait for run_pending.'''
+        steps = self.steps
+        self.steps = []
+        for name, func, optional in steps:
+            if optional and (self.pending or time_remaining() <= 0):
+                self.pending.append((name, func))
+                continue
+            unfinished = self.call(name, func, time_remaining)
+            if unfinished and optional:
+                self.pending.append((name, func))
+        self.last_run = {}
+
+    def run_pending(self, time_remaining):
+        '''carry on with the pending steps while time_remaining() is positive,
+        returns the milliseconds each step got this time'''
+        self.last_run = {}
+        while self.pending and time_remaining() > 0:
+            name, func = self.pending[0]
+            if self.call(name, func, time_remaining):
+                # stopped early, it gets the next turn's idle time
+                break
+            self.pending.pop(0)
+        return self.last_run
+
+    def pending_names(self):
+        return [name for name, func in self.pending]
@@ -0,0 +1,123 @@
+#!/usr/bin/env python
+
+from collections import deque
+from heapq import heappush, heappop
+
+# the search kernels in plain python, the fallback for ckernels and the
+# reference it is checked against. Cells are flat indexes, row*cols + col, on
+# the torus, water is any sequence with nonzero for water. Both modules have
+# the same functions with the same results, tie breaks included, though
+# ckernels hands back arrays where these give lists.
+
+# (rows, cols) -> the n, e, s, w neighbors of every cell
+neighbor_tables = {}
+
+def neighbor_table(rows, cols):
+    table = neighbor_tables.get((rows, cols))
+    if table is None:
+        table = []
+        for row in range(rows):
+            for col in range(cols):
+                table.append((((row - 1) % rows) * cols + col,
+                              row * cols + (col + 1) % cols,
+                              ((row + 1) % rows) * cols + col,
+                              row * cols + (col - 1) % cols))
+        neighbor_tables[(rows, cols)] = table
+    return table
+
+def bfs(rows, cols, water, sources, limit=-1):
+    '''(dist, nearest) lists of the steps from every cell to the nearest of the
+    source cells and which source that is, -1 where none is in reach. limit
+    bounds the steps searched when not negative.'''
+    size = rows * cols
+    neighbors = neighbor_table(rows, cols)
+    dist = [-1] * size
+    nearest = [-1] * size
+    frontier = deque()
+    for i in sources:
+        if dist[i] < 0:
+            dist[i] = 0
+            nearest[i] = i
+            frontier.append(i)
+    while frontier:
+        i = frontier.popleft()
+        d = dist[i] + 1
+        if 0 <= limit < d:
+            continue
+        source = nearest[i]
+        for j in neighbors[i]:
+            if dist[j] < 0 and not water[j]:
+                dist[j] = d
+                nearest[j] = source
+                frontier.append(j)
+    return dist, nearest
+
+def astar(rows, cols, water, start, goal, weight=1.0):
+    '''the cells from start to goal, start excluded, None when goal cannot be
+    reached. The heuristic is the wrapped manhattan distance times weight and
+    ties on f go to the deeper cell, then to the lower index.'''
+    size = rows * cols
+    g = [-1] * size
+    parent = [-1] * size
+    closed = bytearray(size)
+    neighbors = neighbor_table(rows, cols)
+    goal_row, goal_col = divmod(goal, cols)
+
+    def heuristic(i):
+        row, col = divmod(i, cols)
+        d_row = abs(row - goal_row)
+        d_col = abs(col - goal_col)
+        return int((min(d_row, rows - d_row) + min(d_col, cols - d_col)) * weight)
+
+    g[start] = 0
+    frontier = [(heuristic(start), 0, start)]
+    while frontier:
+        f, gc, i = heappop(frontier)
+        gc = -gc
+        if closed[i] or gc > g[i]:
+            continue
+        if i == goal:
+            path = []
+            while i != start:
+                path.append(i)
+                i = parent[i]
+            path.reverse()
+            return path
+        closed[i] = 1
+        gp = gc + 1
+        for j in neighbors[i]:
+            if water[j] or closed[j]:
+                continue
+            if 0 <= g[j] <= gp:
+                continue
+            g[j] = gp
+            parent[j] = i
+            heappush(frontier, (gp + heuristic(j), -gp, j))
+    return None
+
+def diffuse(rows, cols, water, source, value, cost, inc, out):
+    '''add value + cost*d + inc*d*(d-1)/2 to out at every cell d steps from
+    source, out to the first distance where that is no longer positive. out is
+    a writable int sequence, array('i') for ckernels. Returns the cells reached.'''
+    size = rows * cols
+    seen = bytearray(size)
+    neighbors = neighbor_table(rows, cols)
+    seen[source] = 1
+    level = [source]
+    d = 0
+    reached = 0
+    while level:
+        v = value + cost * d + inc * d * (d - 1) // 2
+        if v <= 0:
+            break
+        following = []
+        for i in level:
+            out[i] += v
+            for j in neighbors[i]:
+                if not seen[j] and not water[j]:
+                    seen[j] = 1
+                    following.append(j)
+        reached += len(level)
+        level = following
+        d += 1
+    return reached
@@ -0,0 +1,119 @@
+#!/usr/bin/env python
+
+# which squares have been seen, one byte per square, and the frontier: the
+# seen land squares next to at least one unseen square. Both are kept up to
+# date from the squares seen for the first time, so a turn costs in proportion
+# to what came into view rather than to the map. Cells are flat indexes,
+# row*cols + col, on the torus.
+
+class SeenMap:
+    def __init__(self, rows, cols, neighbors=None, spacing=1):
+        self.rows = rows
+        self.cols = cols
+        size = rows * cols
+        self.seen = bytearray(size)
+        self.water = bytearray(size)
+        self.unseen_count = size
+        self.locs = [(row, col) for row in range(rows) for col in range(cols)]
+        # the n, e, s, w neighbor indexes of each cell, Ants.neighbor_index if given
+        if neighbors is None:
+            neighbors = []
+            for row in range(rows):
+                for col in range(cols):
+                    neighbors.append((((row - 1) % rows) * cols + col,
+                                      row * cols + (col + 1) % cols,
+                                      ((row + 1) % rows) * cols + col,
+                                      row * cols + (col - 1) % cols))
+        self.neighbors = neighbors
+        self.frontier = set()
+        # targets() gives one frontier square per spacing x spacing block,
+        # block -> the frontier square standing for it
+        self.spacing = spacing
+        self.block_cols = -(-cols // spacing)
+        self.chosen = {}
+
+    def index(self, loc):
+        'the flat index of loc, rows and cols out of range wrap around'
+        row, col = loc
+        return (row % self.rows) * self.cols + col % self.cols
+
+    def is_seen(self, loc):
+        return self.seen[self.index(loc)] != 0
+
+    def block(self, i):
+        row, col = divmod(i, self.cols)
+        return (row // self.spacing) * self.block_cols + col // self.spacing
+
+    def mark(self, locs, passable=None):
+        '''record locs as seen and return those seen for the first time.
+        passable(loc) is asked about each of those, water never joins the frontier.'''
+        seen = self.seen
+        water = self.water
+        locs_of = self.locs
+        neighbors = self.neighbors
+        rows = self.rows
+        cols = self.cols
+        new = []
+        for row, col in locs:
+            i = (row % rows) * cols + col % cols
+            if seen[i]:
+                continue
+            seen[i] = 1
+            new.append(i)
+            if passable is not None and not passable(locs_of[i]):
+                water[i] = 1
+        if not new:
+            return []
+        self.unseen_count -= len(new)
+        frontier = self.frontier
+        for i in new:
+            if not water[i]:
+                for j in neighbors[i]:
+                    if not seen[j]:
+                        self.add(i)
+                        break
+            # a neighbor may have lost its last unseen neighbor to i
+            for j in neighbors[i]:
+                if j in frontier:
+                    for k in neighbors[j]:
+                        if not seen[k]:
+                            break
+                    else:
+                        self.discard(j)
+        return [locs_of[i] for i in new]
+
+    def add(self, i):
+        self.frontier.add(i)
+        block = self.block(i)
+        if block not in self.chosen:
+            self.chosen[block] = i
+
+    def discard(self, i):
+        self.frontier.discard(i)
+        block = self.block(i)
+        if self.chosen.get(block) != i:
+            return
+        del self.chosen[block]
+        # another frontier square of the same block takes over
+        spacing = self.spacing
+        rows = self.rows
+        cols = self.cols
+        row, col = divmod(i, cols)
+        top = row - row % spacing
+        left = col - col % spacing
+        frontier = self.frontier
+        for r in range(top, min(top + spacing, rows)):
+            for c in range(left, min(left + spacing, cols)):
+                j = r * cols + c
+                if j in frontier:
+                    self.chosen[block] = j
+                    return
+
+    def frontier_locs(self):
+        locs = self.locs
+        return [locs[i] for i in self.frontier]
+
+    def targets(self):
+        'one frontier square per spacing x spacing block, as locations'
+        locs = self.locs
+        return [locs[i] for i in self.chosen.values()]
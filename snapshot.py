@@ -0,0 +1,135 @@
+#!/usr/bin/env python
+
+import os
+import sys
+import mmap
+import struct
+import hashlib
+from array import array
+
+import kernels
+
+# what a game taught us about its map, kept for the next game on the same map.
+# One file per map, named by a fingerprint of the dimensions and of the water
+# and hills in view on the first turn. A file is a header, one byte per square
+# for water, the enemy hills, and then for every square the steps to the
+# nearest of those hills and which hill that is. Files are memory mapped and
+# only the parts asked for are read.
+
+MAGIC = b'ANTSNAP1'
+HEADER = struct.Struct('<8sIII')
+UNREACHABLE = 0xffff
+
+
+class Snapshot:
+    'one saved map, read lazily from a memory mapped file'
+    def __init__(self, path, rows, cols):
+        self.rows = rows
+        self.cols = cols
+        self.map = None
+        handle = open(path, 'rb')
+        try:
+            self.map = mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+        finally:
+            handle.close()
+        magic, s_rows, s_cols, hill_count = HEADER.unpack_from(self.map, 0)
+        size = rows * cols
+        self.water_start = HEADER.size
+        self.hills_start = self.water_start + size
+        self.dist_start = self.hills_start + 4 * hill_count
+        self.nearest_start = self.dist_start + 2 * size
+        self.hill_count = hill_count
+        if (magic != MAGIC or (s_rows, s_cols) != (rows, cols)
+                or len(self.map) != self.nearest_start + 2 * size):
+            self.close()
+            raise ValueError('not a snapshot of a %dx%d map: %s' % (rows, cols, path))
+        self.hill_list = None
+
+    def close(self):
+        if self.map is not None:
+            self.map.close()
+            self.map = None
+
+    def water(self):
+        'flat indexes of the squares that were water'
+        data = bytearray(self.map[self.water_start:self.hills_start])
+        return [i for i, value in enumerate(data) if value]
+
+    def hills(self):
+        'the enemy hills seen in that game, as locations'
+        if self.hill_list is None:
+            values = struct.unpack_from('<%dH' % (2 * self.hill_count), self.map, self.hills_start)
+            self.hill_list = list(zip(values[0::2], values[1::2]))
+        return self.hill_list
+
+    def nearest_hill(self, loc):
+        '(steps, hill) to the nearest of hills() from loc over the saved water, None if none'
+        i = loc[0] * self.cols + loc[1]
+        dist, = struct.unpack_from('<H', self.map, self.dist_start + 2 * i)
+        if dist == UNREACHABLE:
+            return None
+        nearest, = struct.unpack_from('<H', self.map, self.nearest_start + 2 * i)
+        return dist, self.hills()[nearest]
+
+
+class SnapshotStore:
+    def __init__(self, directory, rows, cols):
+        self.directory = directory
+        self.rows = rows
+        self.cols = cols
+
+    def fingerprint(self, my_hills, water):
+        'a key for the map from what the first turn shows of it'
+        digest = hashlib.sha1()
+        digest.update(('%d %d\n' % (self.rows, self.cols)).encode('ascii'))
+        for row, col in sorted(my_hills):
+            digest.update(('h %d %d\n' % (row, col)).encode('ascii'))
+        for row, col in sorted(water):
+            digest.update(('w %d %d\n' % (row, col)).encode('ascii'))
+        return digest.hexdigest()[:16]
+
+    def path(self, fingerprint):
+        return os.path.join(self.directory, '%dx%d-%s.snap' % (self.rows, self.cols, fingerprint))
+
+    def load(self, fingerprint):
+        'the Snapshot saved for fingerprint, None when there is none or it does not read'
+        path = self.path(fingerprint)
+        if not os.path.exists(path):
+            return None
+        try:
+            return Snapshot(path, self.rows, self.cols)
+        except (IOError, OSError, ValueError, struct.error, mmap.error):
+            return None
+
+    def save(self, fingerprint, water, hills):
+        '''write the water squares and enemy hills learned in a game, both as
+        locations, with the distances to those hills over that water'''
+        rows, cols = self.rows, self.cols
+        size = rows * cols
+        hills = sorted(hills)[:UNREACHABLE]
+        water_bytes = bytearray(size)
+        for row, col in water:
+            water_bytes[row * cols + col] = 1
+        hill_index = [row * cols + col for row, col in hills]
+        dist, nearest = kernels.bfs(rows, cols, water_bytes, hill_index)
+        ordinal = dict((i, n) for n, i in enumerate(hill_index))
+        dist_table = array('H', [min(d, UNREACHABLE - 1) if d >= 0 else UNREACHABLE for d in dist])
+        nearest_table = array('H', [ordinal.get(i, 0) for i in nearest])
+        hill_table = array('H', [value for hill in hills for value in hill])
+        if not os.path.isdir(self.directory):
+            os.makedirs(self.directory)
+        path = self.path(fingerprint)
+        # written aside and renamed so a reader never maps half a file
+        temp = '%s.%d.tmp' % (path, os.getpid())
+        output = open(temp, 'wb')
+        try:
+            output.write(HEADER.pack(MAGIC, rows, cols, len(hills)))
+            output.write(bytes(water_bytes))
+            for table in (hill_table, dist_table, nearest_table):
+                if sys.byteorder == 'big':
+                    table.byteswap()
+                output.write((table.tobytes if hasattr(table, 'tobytes') else table.tostring)())
+        finally:
+            output.close()
+        os.rename(temp, path)
+        return path
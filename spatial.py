@@ -0,0 +1,126 @@
+#!/usr/bin/env python
+
+from collections import defaultdict
+from math import sqrt, ceil
+
+# a uniform grid of buckets over the torus for proximity queries. Bucket sides
+# are at least the query radius, so a radius query reads the 3x3 buckets around
+# a location; rows and columns are split as evenly as they divide so that no
+# bucket is more than a square longer than the rest.
+
+class SpatialIndex:
+    def __init__(self, rows, cols, radius2=None, size=None):
+        self.rows = rows
+        self.cols = cols
+        if size is None:
+            size = int(ceil(sqrt(radius2))) if radius2 else 8
+        size = max(1, size)
+        self.b_rows = max(1, rows // size)
+        self.b_cols = max(1, cols // size)
+        # the shortest bucket side
+        self.size = min(rows // self.b_rows, cols // self.b_cols)
+        self.grid = defaultdict(list)
+        self.count = 0
+        # (bucket, span) -> the distinct buckets within span of it
+        self.around = {}
+
+    def __len__(self):
+        return self.count
+
+    def key(self, loc):
+        return (loc[0] * self.b_rows // self.rows, loc[1] * self.b_cols // self.cols)
+
+    def clear(self):
+        self.grid.clear()
+        self.count = 0
+
+    def build(self, locs):
+        'replace the contents with locs'
+        self.clear()
+        grid = self.grid
+        key = self.key
+        for loc in locs:
+            grid[key(loc)].append(loc)
+            self.count += 1
+
+    def add(self, loc):
+        self.grid[self.key(loc)].append(loc)
+        self.count += 1
+
+    def remove(self, loc):
+        bucket = self.grid.get(self.key(loc))
+        if bucket and loc in bucket:
+            bucket.remove(loc)
+            self.count -= 1
+
+    def ring(self, b_row, b_col, radius, seen):
+        'the buckets exactly radius buckets away, skipping any already seen across the wrap'
+        b_rows, b_cols = self.b_rows, self.b_cols
+        for d_row in range(-radius, radius + 1):
+            step = 2 * radius if abs(d_row) != radius and radius else 1
+            for d_col in range(-radius, radius + 1, step):
+                key = ((b_row + d_row) % b_rows, (b_col + d_col) % b_cols)
+                if key not in seen:
+                    seen.add(key)
+                    yield key
+
+    def buckets_around(self, key, span):
+        around = self.around.get((key, span))
+        if around is None:
+            seen = set()
+            around = []
+            for radius in range(min(span, max(self.b_rows, self.b_cols)) + 1):
+                around.extend(self.ring(key[0], key[1], radius, seen))
+            self.around[(key, span)] = around
+        return around
+
+    def within(self, loc, radius2):
+        '(distance squared, location) of everything within radius2 of loc, nearest first'
+        rows, cols = self.rows, self.cols
+        grid = self.grid
+        row, col = loc
+        span = int(ceil(sqrt(radius2) / self.size))
+        found = []
+        for key in self.buckets_around(self.key(loc), span):
+            for other in grid.get(key, ()):
+                d_row = abs(row - other[0])
+                d_col = abs(col - other[1])
+                d_row = min(d_row, rows - d_row)
+                d_col = min(d_col, cols - d_col)
+                d2 = d_row * d_row + d_col * d_col
+                if d2 <= radius2:
+                    found.append((d2, other))
+        found.sort()
+        return found
+
+    def nearest(self, loc, k, max_dist=None):
+        '(distance, location) of the k locations nearest loc by wrapped manhattan distance'
+        rows, cols, size = self.rows, self.cols, self.size
+        grid = self.grid
+        row, col = loc
+        if not self.count:
+            return []
+        b_row, b_col = self.key(loc)
+        seen = set()
+        found = []
+        max_radius = max(self.b_rows, self.b_cols) // 2 + 1
+        for radius in range(max_radius + 1):
+            for key in self.ring(b_row, b_col, radius, seen):
+                for other in grid.get(key, ()):
+                    d_row = abs(row - other[0])
+                    d_col = abs(col - other[1])
+                    found.append((min(d_row, rows - d_row) + min(d_col, cols - d_col), other))
+            if len(found) == self.count:
+                break
+            # anything in the next ring is at least this many squares away
+            reach = radius * size
+            if max_dist is not None and reach > max_dist:
+                break
+            if len(found) >= k:
+                found.sort()
+                if found[k - 1][0] <= reach:
+                    break
+        found.sort()
+        if max_dist is not None:
+            found = [(dist, other) for dist, other in found if dist <= max_dist]
+        return found[:k]
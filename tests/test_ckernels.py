@@ -0,0 +1,64 @@
+import os
+import sys
+import random
+from array import array
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import kernels
+import pykernels
+from test_kernels import random_map
+
+# the compiled kernels against the python ones on the same random maps, both
+# must give the same answers. Needs ckernels built in place, see setup_kernels.py.
+ckernels = pytest.importorskip('ckernels')
+
+SEEDS = range(20)
+
+@pytest.mark.parametrize('seed', SEEDS)
+def test_bfs(seed):
+    rng = random.Random(seed)
+    for trial in range(10):
+        rows, cols, water, land = random_map(rng)
+        if not land:
+            continue
+        sources = rng.sample(land, min(len(land), rng.randint(1, 5)))
+        limit = rng.choice([-1, rng.randint(0, 20)])
+        dist, nearest = pykernels.bfs(rows, cols, water, sources, limit)
+        c_dist, c_nearest = ckernels.bfs(rows, cols, water, sources, limit)
+        assert list(c_dist) == list(dist)
+        assert list(c_nearest) == list(nearest)
+
+@pytest.mark.parametrize('seed', SEEDS)
+def test_astar(seed):
+    rng = random.Random(seed)
+    for trial in range(10):
+        rows, cols, water, land = random_map(rng)
+        if len(land) < 2:
+            continue
+        start, goal = rng.sample(land, 2)
+        weight = rng.choice([0.5, 0.9, 1.0, 1.5])
+        assert (ckernels.astar(rows, cols, water, start, goal, weight) ==
+                pykernels.astar(rows, cols, water, start, goal, weight))
+
+@pytest.mark.parametrize('seed', SEEDS)
+def test_diffuse(seed):
+    rng = random.Random(seed)
+    for trial in range(10):
+        rows, cols, water, land = random_map(rng)
+        if not land:
+            continue
+        start = rng.choice(land)
+        value = rng.randint(1, 150)
+        cost = rng.randint(-10, 2)
+        inc = rng.choice([-1, 0, 1])
+        out = array('i', [0]) * (rows * cols)
+        c_out = array('i', [0]) * (rows * cols)
+        expected = pykernels.diffuse(rows, cols, water, start, value, cost, inc, out)
+        assert ckernels.diffuse(rows, cols, water, start, value, cost, inc, c_out) == expected
+        assert c_out == out
+
+def test_crosscheck():
+    assert kernels.crosscheck(ckernels) == []
@@ -0,0 +1,139 @@
+import os
+import sys
+import random
+from array import array
+from collections import deque
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import kernels
+import pykernels
+
+try:
+    from importlib import reload
+except ImportError:
+    pass
+
+# pykernels, the kernels every bot runs without ckernels, against a plain
+# breadth first search over (row, col) locations
+
+SEEDS = range(20)
+
+def random_map(rng):
+    rows = rng.randint(4, 40)
+    cols = rng.randint(4, 40)
+    size = rows * cols
+    water = bytearray(size)
+    for i in range(size):
+        if rng.random() < 0.3:
+            water[i] = 1
+    land = [i for i in range(size) if not water[i]]
+    return rows, cols, water, land
+
+def reference_dist(rows, cols, water, source):
+    'steps from source to every cell, -1 where it cannot be reached'
+    dist = [-1] * (rows * cols)
+    dist[source] = 0
+    frontier = deque([divmod(source, cols)])
+    while frontier:
+        row, col = frontier.popleft()
+        d = dist[row * cols + col]
+        for d_row, d_col in ((-1, 0), (0, 1), (1, 0), (0, -1)):
+            j = ((row + d_row) % rows) * cols + (col + d_col) % cols
+            if dist[j] < 0 and not water[j]:
+                dist[j] = d + 1
+                frontier.append(divmod(j, cols))
+    return dist
+
+def adjacent(rows, cols, i, j):
+    row, col = divmod(i, cols)
+    return j in [((row + d_row) % rows) * cols + (col + d_col) % cols
+                 for d_row, d_col in ((-1, 0), (0, 1), (1, 0), (0, -1))]
+
+@pytest.mark.parametrize('seed', SEEDS)
+def test_bfs(seed):
+    rng = random.Random(seed)
+    for trial in range(5):
+        rows, cols, water, land = random_map(rng)
+        if not land:
+            continue
+        sources = rng.sample(land, min(len(land), rng.randint(1, 5)))
+        limit = rng.choice([-1, rng.randint(0, 20)])
+        dist, nearest = pykernels.bfs(rows, cols, water, sources, limit)
+        from_source = dict((source, reference_dist(rows, cols, water, source)) for source in sources)
+        for i in range(rows * cols):
+            reachable = [from_source[source][i] for source in sources if from_source[source][i] >= 0]
+            expected = min(reachable) if reachable else -1
+            if 0 <= limit < expected:
+                expected = -1
+            assert dist[i] == expected
+            if expected < 0:
+                assert nearest[i] == -1
+            else:
+                # ties may go to any of the nearest sources
+                assert from_source[nearest[i]][i] == expected
+
+@pytest.mark.parametrize('seed', SEEDS)
+def test_astar(seed):
+    rng = random.Random(seed)
+    for trial in range(5):
+        rows, cols, water, land = random_map(rng)
+        if len(land) < 2:
+            continue
+        start, goal = rng.sample(land, 2)
+        weight = rng.choice([0.5, 0.9, 1.0, 1.5])
+        path = pykernels.astar(rows, cols, water, start, goal, weight)
+        steps = reference_dist(rows, cols, water, start)[goal]
+        if steps < 0:
+            assert path is None
+            continue
+        assert path[-1] == goal
+        previous = start
+        for i in path:
+            assert not water[i]
+            assert adjacent(rows, cols, previous, i)
+            previous = i
+        if weight <= 1.0:
+            # an admissible heuristic gives a shortest path
+            assert len(path) == steps
+
+@pytest.mark.parametrize('seed', SEEDS)
+def test_diffuse(seed):
+    rng = random.Random(seed)
+    for trial in range(5):
+        rows, cols, water, land = random_map(rng)
+        if not land:
+            continue
+        source = rng.choice(land)
+        value = rng.randint(1, 150)
+        cost = rng.randint(-10, 2)
+        inc = rng.choice([-1, 0, 1])
+        # the values by distance, up to the first one that is not positive
+        table = []
+        for d in range(rows * cols):
+            v = value + cost * d + inc * d * (d - 1) // 2
+            if v <= 0:
+                break
+            table.append(v)
+        out = array('i', [1]) * (rows * cols)
+        reached = pykernels.diffuse(rows, cols, water, source, value, cost, inc, out)
+        dist = reference_dist(rows, cols, water, source)
+        expected = [1 + table[d] if 0 <= d < len(table) else 1 for d in dist]
+        assert list(out) == expected
+        assert reached == len([d for d in dist if 0 <= d < len(table)])
+
+def test_fallback(monkeypatch):
+    'without ckernels, kernels hands out the pykernels functions'
+    # None in sys.modules makes the import raise ImportError
+    monkeypatch.setitem(sys.modules, 'ckernels', None)
+    try:
+        reload(kernels)
+        assert not kernels.compiled
+        assert kernels.bfs is pykernels.bfs
+        assert kernels.astar is pykernels.astar
+        assert kernels.diffuse is pykernels.diffuse
+    finally:
+        monkeypatch.undo()
+        reload(kernels)
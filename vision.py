@@ -0,0 +1,119 @@
+#!/usr/bin/env python
+
+from math import sqrt
+
+# numpy is optional, without it every pass falls back to plain python loops
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+def disk_offsets(radius2):
+    'all (d_row, d_col) offsets within a squared radius'
+    mx = int(sqrt(radius2))
+    return [(d_row, d_col)
+            for d_row in range(-mx, mx + 1)
+            for d_col in range(-mx, mx + 1)
+            if d_row**2 + d_col**2 <= radius2]
+
+class Vision:
+    '''stamps the view disk of every ant onto a toroidal grid in one pass and
+    keeps the set of squares ever seen, so each pass also reports what is new'''
+    def __init__(self, rows, cols, radius2):
+        self.rows = rows
+        self.cols = cols
+        self.radius2 = radius2
+        self.offsets = disk_offsets(radius2)
+        self.locs = [(row, col) for row in range(rows) for col in range(cols)]
+        self.vectorized = numpy is not None
+        if self.vectorized:
+            self.d_rows = numpy.array([d_row for d_row, d_col in self.offsets])
+            self.d_cols = numpy.array([d_col for d_row, d_col in self.offsets])
+            self.seen = numpy.zeros(rows * cols, dtype=bool)
+        else:
+            self.seen = bytearray(rows * cols)
+
+    def stamp(self, ant_locs):
+        '''return the vision grid for ant_locs, a (rows, cols) boolean array,
+        or a list of lists when numpy is missing'''
+        rows = self.rows
+        cols = self.cols
+        if self.vectorized:
+            vision = numpy.zeros(rows * cols, dtype=bool)
+            if ant_locs:
+                locs = numpy.array(ant_locs)
+                a_rows = (locs[:, 0:1] + self.d_rows) % rows
+                a_cols = (locs[:, 1:2] + self.d_cols) % cols
+                vision[a_rows * cols + a_cols] = True
+            return vision.reshape(rows, cols)
+        vision = [[False]*cols for row in range(rows)]
+        for a_row, a_col in ant_locs:
+            for d_row, d_col in self.offsets:
+                vision[(a_row + d_row) % rows][(a_col + d_col) % cols] = True
+        return vision
+
+    def update(self, ant_locs, passable=None, water=None):
+        '''stamp vision for ant_locs and return (vision, new_locs, new_water)
+        new_locs are the squares seen for the first time. Water among them is
+        taken from water, a flat array with nonzero for water, or from passable(loc).'''
+        vision = self.stamp(ant_locs)
+        locs = self.locs
+        if self.vectorized:
+            flat = vision.reshape(-1)
+            new = numpy.nonzero(flat & ~self.seen)[0]
+            self.seen |= flat
+            if water is not None:
+                new_water = [locs[i] for i in new[numpy.asarray(water)[new] != 0]]
+            elif passable is not None:
+                new_water = [locs[i] for i in new if not passable(locs[i])]
+            else:
+                new_water = []
+            return vision, [locs[i] for i in new], new_water
+        cols = self.cols
+        seen = self.seen
+        new_locs = []
+        for row, vision_row in enumerate(vision):
+            for col, is_visible in enumerate(vision_row):
+                if is_visible and not seen[row * cols + col]:
+                    seen[row * cols + col] = 1
+                    new_locs.append(locs[row * cols + col])
+        if water is not None:
+            new_water = [loc for loc in new_locs if water[loc[0] * cols + loc[1]]]
+        elif passable is not None:
+            new_water = [loc for loc in new_locs if not passable(loc)]
+        else:
+            new_water = []
+        return vision, new_locs, new_water
+
+    def pairs(self, sources, targets, radius2=None):
+        '''return (distance2, i, j) for every source i and target j within radius2
+        of each other, by default the view radius. Sorted by distance2.'''
+        if not sources or not targets:
+            return []
+        if radius2 is None:
+            radius2 = self.radius2
+        rows = self.rows
+        cols = self.cols
+        if self.vectorized:
+            s = numpy.array(sources)
+            t = numpy.array(targets)
+            d_rows = numpy.abs(s[:, 0:1] - t[:, 0])
+            d_rows = numpy.minimum(d_rows, rows - d_rows)
+            d_cols = numpy.abs(s[:, 1:2] - t[:, 1])
+            d_cols = numpy.minimum(d_cols, cols - d_cols)
+            d2 = d_rows * d_rows + d_cols * d_cols
+            i, j = numpy.nonzero(d2 <= radius2)
+            result = list(zip(d2[i, j].tolist(), i.tolist(), j.tolist()))
+        else:
+            result = []
+            for i, (s_row, s_col) in enumerate(sources):
+                for j, (t_row, t_col) in enumerate(targets):
+                    d_row = abs(s_row - t_row)
+                    d_row = min(d_row, rows - d_row)
+                    d_col = abs(s_col - t_col)
+                    d_col = min(d_col, cols - d_col)
+                    d2 = d_row * d_row + d_col * d_col
+                    if d2 <= radius2:
+                        result.append((d2, i, j))
+        result.sort()
+        return result
@@ -0,0 +1,129 @@
+#!/usr/bin/env python
+
+import time
+import multiprocessing
+from multiprocessing.sharedctypes import RawArray
+
+import kernels
+
+# a helper process that computes distance fields while the bot waits on the
+# engine. After a turn the bot submits the known water and the sources of each
+# field it expects to need; the helper writes every field into shared grids and
+# reports back. A result is tagged with the water_version and sources it was
+# computed for, the bot checks those against the next turn and drops it when
+# either changed. Paths are not precomputed: for an adopted field find_path
+# and fdistance read the next step and distance straight off the grids, so
+# stored_paths entries along the same chains would only repeat them.
+
+# how long close() waits for the helper before killing it
+JOIN_SECONDS = 0.5
+
+def serve(rows, cols, kinds, results, conn):
+    'the helper process, runs jobs from conn until it receives None'
+    size = rows * cols
+    water = bytearray(size)
+    while True:
+        job = conn.recv()
+        # only the newest job is worth doing, older ones still bring their water
+        while job is not None and conn.poll():
+            if job[2] is not None:
+                water[:] = job[2]
+            job = conn.recv()
+        if job is None:
+            break
+        generation, water_version, job_water, sources = job
+        if job_water is not None:
+            water[:] = job_water
+        start = time.time()
+        for kind in kinds:
+            dist, nearest = kernels.bfs(rows, cols, water,
+                                        [row * cols + col for row, col in sources[kind]])
+            dist_grid, nearest_grid = results[kind]
+            dist_grid[:] = dist
+            nearest_grid[:] = nearest
+        conn.send((generation, round(1000 * (time.time() - start), 3)))
+    conn.close()
+
+
+class FieldWorker:
+    def __init__(self, rows, cols, kinds):
+        self.rows = rows
+        self.cols = cols
+        self.kinds = tuple(kinds)
+        size = rows * cols
+        # kind -> (dist, nearest) grids the helper writes and the bot reads
+        self.results = dict((kind, (RawArray('i', size), RawArray('i', size)))
+                            for kind in self.kinds)
+        self.conn, child_conn = multiprocessing.Pipe()
+        self.process = multiprocessing.Process(target=serve,
+                                               args=(rows, cols, self.kinds, self.results, child_conn))
+        self.process.daemon = True
+        self.process.start()
+        child_conn.close()
+        self.generation = 0
+        # (generation, water_version, {kind: sources}) of the last job sent
+        self.outstanding = None
+        self.sent_water_version = None
+        # counts of jobs sent, results taken, results superseded before they came back
+        self.submitted = 0
+        self.collected = 0
+        self.superseded = 0
+        self.last_ms = None
+
+    def submit(self, water, water_version, sources):
+        '''queue a job on the helper, water is the known water grid and sources
+        maps each kind to the locations its field grows from'''
+        if self.outstanding is not None:
+            self.superseded += 1
+        self.generation += 1
+        sources = dict((kind, frozenset(sources[kind])) for kind in self.kinds)
+        # the water only travels when it changed since the last job
+        job_water = None
+        if water_version != self.sent_water_version:
+            job_water = bytes(water)
+            self.sent_water_version = water_version
+        self.conn.send((self.generation, water_version, job_water, sources))
+        self.outstanding = (self.generation, water_version, sources)
+        self.submitted += 1
+
+    def collect(self):
+        '''(water_version, {kind: sources}) of the last job once the helper is
+        done with it, else None. Results of older jobs are dropped, their grids
+        have been written over.'''
+        if self.outstanding is None:
+            return None
+        finished = None
+        while self.conn.poll():
+            finished = self.conn.recv()
+        if finished is None:
+            return None
+        generation, self.last_ms = finished
+        if generation != self.outstanding[0]:
+            return None
+        generation, water_version, sources = self.outstanding
+        self.outstanding = None
+        self.collected += 1
+        return water_version, sources
+
+    def fields(self, kind):
+        '''(dist, nearest) lists of kind from the job collect() handed back,
+        the helper waits for the next job so the grids hold still until then'''
+        dist_grid, nearest_grid = self.results[kind]
+        return dist_grid[:], nearest_grid[:]
+
+    def stats(self):
+        return {'submitted': self.submitted, 'collected': self.collected,
+                'superseded': self.superseded, 'last_ms': self.last_ms}
+
+    def close(self):
+        if self.process is None:
+            return
+        try:
+            self.conn.send(None)
+        except (IOError, OSError):
+            pass
+        self.process.join(JOIN_SECONDS)
+        if self.process.is_alive():
+            self.process.terminate()
+        self.conn.close()
+        self.process = None